@@ -1,2 +1,5 @@
 from .clusterer import Clusterer
 from .clusterconstructor import ClusterConstructor
+from .ward import ward_linkage
+from .twolevel import two_level_linkage
+from .incremental import collapse
@@ -1,6 +1,9 @@
 # -- Imports ------------------------------------------------------------------
 
 # base
+import copy
+
+# third party
 import numpy as np
 
 
@@ -40,12 +43,20 @@ class ClusterConstructor:
         # create pointers to the data from clusterer
         self.words = clusterer.words
         self.vectors = clusterer.vectors
+        self.weights = clusterer.weights
+        self.counts = clusterer.counts
         self.Z = clusterer.Z
+        self.projection = clusterer.projection
+
+        self.clusters, self.non_selected = self.form_clusters()
 
-        self.clusters = self.form_clusters()
-        selected = [word for cluster in self.clusters for word in cluster]
-        self.non_selected = [
-            word for word in self.words if word not in selected]
+        # with the cut tier engine the words are not linked again, every
+        # tier is cut from this linkage up front
+        if config['tier_engine'] == 'cut':
+            self.thresholds = thresholds(config)
+            self.tiers = cut(self.Z.values, self.thresholds)
+            self.tier = 0
+            self.labels = list(self.words)
 
         # this will be overwritten further down the line by gatekeeper
         # and will decide when to stop doing the work
@@ -63,80 +74,239 @@ class ClusterConstructor:
         It takes in the Z attribute produced during the clustering stage of
         Clusterer and extracts the appropriate heirachy and clusters.
 
+        A cluster is the largest subtree of the dendrogram whose merge
+        distance is below self.distance, so its parent merges at or above
+        it. As the leaves of every subtree are a contiguous span of the
+        post-order of the tree, each cluster is a slice of that order.
+
         Returns
         -------
-        list
+        (list, list)
+            the clusters, from the last formed to the first, and the words
+            that are not in any cluster
+
+        """
+        Z = self.Z.values
+        n = len(self.words)
+        order, start, size = spans(Z)
+
+        distance = Z[:, 2]
+        merged = np.arange(n, 2 * n - 1)
+        top = (distance < self.distance) & (ceilings(Z) >= self.distance)
+
+        clusters = [
+            [self.words[i] for i in order[start[k]:start[k] + size[k]]]
+            for k in merged[top][::-1]]
+
+        selected = np.zeros(n, dtype=bool)
+        for k in merged[top]:
+            selected[order[start[k]:start[k] + size[k]]] = True
+        non_selected = [word for word, s in zip(self.words, selected) if not s]
+
+        return clusters, non_selected
 
+    def advance(self, mapping):
         """
-        def retrieve_clusters(Z, leaves, labels):
-            """
-            given the ward-linked array, a list of leaf indices and the label
-            list returns a list of the words in a cluster
-
-            @params
-                Z  =  [[Rational]]
-                leaves = [Int]
-                labels = [Int]
-            """
-            while np.max(leaves) > Z.shape[0]:
-                m = np.max(leaves)
-                leaf = int(m) - len(labels)
-                # so the above can send us on an infinite loop if the occasion
-                # just so
-                # happens to be right, let's not let negative leaf values exist
-                if leaf > 1:
-                    leaves += [Z.iloc[leaf, 0], Z.iloc[leaf, 1]]
-                leaves.remove(m)
-
-            leaves = [int(leaf) for leaf in leaves]
-            words = [labels[leaf] for leaf in leaves]
-
-            return words
-
-        # list to collect our clusters
-        word_list = []
-        # list of non selected clusters based on distance criterion
-        non_selected = []
-
-        # iterate through linkage data frame and create clusters
-        for i, row in self.Z.iterrows():
-            item = []
-            ns_item = []
-            # if the leaves satisfy our distance threshold then
-            if row[2] < self.distance:
-                leaves = [row[0], row[1]]
-                item.append(retrieve_clusters(self.Z, leaves, self.words))
-                word_list += item
-            else:
-                leaves = [row[0], row[1]]
-                ns_item.append(retrieve_clusters(self.Z, leaves, self.words))
-                non_selected += ns_item
-        # Now we walk backwards through the list throwing away anything we've
-        # already encountered
-        # The justification for this is that it is a sequential process linking
-        # closely formed clusters together - by starting at the end and stepping
-        # back through the clusters we can ignore any subclusters that formed
-        # larger clusters toward the end of the process.
-        # As this functionality is needed for both the selected and non selected
-        # clusters it was wrapped in a function
-
-        def strip(ls):
-            stripped = []
-
-            for group in ls[::-1]:
-                flat = []
-                for item in group:
-                    flat.append(item)
-
-                exclude = np.sum(set(flat) <= set(added) for added in stripped)
-                if not exclude:
-                    stripped.append(flat)
-
-            return stripped
-
-        self.non_selected = [w for l in strip(non_selected) for w in l]
-
-        return strip(word_list)
+        Move on to the next tier cut from the same linkage, see cut
+
+        The words of the next tier are the labels the original words have
+        been given so far. Each label joins the cluster of the first word
+        that carries it, and a cluster is formed where the cut brings
+        together more than one label.
+
+        Parameters
+        ----------
+        mapping : dict
+            the labels accepted in this tier, keyed by the word they replace
+
+        Returns
+        -------
+        ClusterConstructor
+            the constructor of the next tier
+
+        """
+        tier = copy.copy(self)
+        tier.tier = self.tier + 1
+        tier.distance = self.thresholds[tier.tier]
+        tier.previous = self.words
+        tier.labels = [mapping.get(label, label) for label in self.labels]
+
+        first = {}
+        tier.counts = {}
+        for label, node, weight in zip(tier.labels,
+                                       self.tiers[tier.tier],
+                                       self.weights):
+            first.setdefault(label, node)
+            tier.counts[label] = tier.counts.get(label, 0) + weight
+        tier.words = list(first)
+
+        groups = {}
+        for label, node in first.items():
+            if node >= 0:
+                groups.setdefault(node, []).append(label)
+
+        # the latest formed first, as form_clusters returns them
+        tier.clusters = [groups[node] for node in sorted(groups, reverse=True)
+                         if len(groups[node]) > 1]
+        selected = {word for cluster in tier.clusters for word in cluster}
+        tier.non_selected = [
+            word for word in tier.words if word not in selected]
+
+        print('_' * 79)
+        print(f"    ** Cut {len(tier.words)} items at {tier.distance}")
+        print(f"    ** Generated {len(tier.clusters)} clusters")
+
+        return tier
+
+
+def thresholds(config):
+    """
+    The distances the tiers are cut at, from config['distance'] up to
+    config['cutoff'] in steps of config['stepsize'], stepped in the same way
+    Gatekeeper steps them
+
+    Parameters
+    ----------
+    config : dict
+        a dictionary of configs
+
+    Returns
+    -------
+    list
+        the distance of each tier
+
+    """
+    distance = config['distance']
+    steps = [distance]
+
+    while distance < config['cutoff']:
+        distance += config['stepsize']
+        steps.append(distance)
+
+    return steps
+
+
+def ceilings(Z):
+    """
+    The distance at which each cluster of a linkage tree is merged into its
+    parent, infinite for the root
+
+    Parameters
+    ----------
+    Z : numpy.ndarray
+        an (n - 1, 4) linkage matrix
+
+    Returns
+    -------
+    numpy.ndarray
+        the distance for the cluster formed in each row
+
+    """
+    n = len(Z) + 1
+    merged = np.arange(n, 2 * n - 1)
+
+    parent = np.full(2 * n - 1, -1)
+    parent[Z[:, 0].astype(int)] = merged
+    parent[Z[:, 1].astype(int)] = merged
+
+    up = parent[merged]
+    above = np.full(n - 1, np.inf)
+    above[up >= 0] = Z[up[up >= 0] - n, 2]
+
+    return above
+
+
+def cut(Z, distances):
+    """
+    Cut a linkage tree at several distances in one pass.
+
+    The cluster formed in a row is the largest one below every distance
+    greater than its own but no greater than that of its parent. Each such
+    (cluster, distance) pair marks the span of the cluster in the post-order
+    of spans, and a running sum along each distance turns the marks into the
+    cluster of every leaf.
+
+    Parameters
+    ----------
+    Z : numpy.ndarray
+        an (n - 1, 4) linkage matrix with monotone distances
+
+    distances : [float]
+        increasing distances to cut the tree at
+
+    Returns
+    -------
+    numpy.ndarray
+        a (len(distances), n) matrix holding the node (n + row) of the
+        cluster of each leaf below each distance, -1 for leaves that are
+        still on their own
+
+    """
+    n = len(Z) + 1
+    distances = np.asarray(distances)
+    order, start, size = spans(Z)
+
+    lo = np.searchsorted(distances, Z[:, 2], side='right')
+    hi = np.searchsorted(distances, ceilings(Z), side='right')
+    counts = np.maximum(hi - lo, 0)
+
+    node = np.repeat(np.arange(n, 2 * n - 1), counts)
+    tier = np.arange(counts.sum()) \
+        - np.repeat(np.cumsum(counts) - counts, counts) \
+        + np.repeat(lo, counts)
+
+    marks = np.zeros((len(distances), n + 1), dtype=np.int64)
+    np.add.at(marks, (tier, start[node]), node + 1)
+    np.add.at(marks, (tier, start[node] + size[node]), -node - 1)
+
+    tiers = np.empty((len(distances), n), dtype=np.int64)
+    tiers[:, order] = np.cumsum(marks[:, :n], axis=1) - 1
+
+    return tiers
+
+
+def spans(Z):
+    """
+    Lay out the leaves of a linkage tree so that the leaves below every node
+    are contiguous, with a single post-order traversal
+
+    Parameters
+    ----------
+    Z : numpy.ndarray
+        an (n - 1, 4) linkage matrix
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        the leaves in post-order, and the start and length of the span of
+        each node (leaves first, then node n + i for row i) in that order
+
+    """
+    n = len(Z) + 1
+    left = Z[:, 0].astype(int).tolist()
+    right = Z[:, 1].astype(int).tolist()
+
+    order = []
+    start = [0] * (2 * n - 1)
+    size = [1] * (2 * n - 1)
+
+    # each node is visited twice, before its children (False) and after
+    # them (True), when its span is complete
+    stack = [(2 * n - 2, False)] if n > 1 else [(0, False)]
+    while stack:
+        node, done = stack.pop()
+        if node < n:
+            start[node] = len(order)
+            order.append(node)
+        elif done:
+            k = node - n
+            start[node] = start[left[k]]
+            size[node] = size[left[k]] + size[right[k]]
+        else:
+            k = node - n
+            stack += [(node, True), (right[k], False), (left[k], False)]
+
+    return np.array(order), np.array(start), np.array(size)
 
 
 # -- Boilerplate --------------------------------------------------------------
@@ -1,8 +1,20 @@
 # -- Imports ------------------------------------------------------------------
 
+# base
+import hashlib
+
 # third party
+import numpy as np
 import pandas as pd
 import scipy.cluster.hierarchy as H
+from sklearn.metrics import adjusted_rand_score
+
+# project
+from lib.embedding import (embed, embed_tokens, quantise, fit_projection,
+                           project, fingerprint)
+from .store import content_key, load_array, save_array
+from .twolevel import two_level_linkage
+from .ward import ward_linkage
 
 
 # -- Definitions --------------------------------------------------------------
@@ -11,7 +23,13 @@ class Clusterer:
     A class that embedds and clusters the strings.
     """
 
-    def __init__(self, loader, model, config):
+    def __init__(self,
+                 loader,
+                 model,
+                 config,
+                 cache=None,
+                 projection=None,
+                 model_path=None):
         """
         Constructor for the clusterer object.
         The main purpose of this is to load and process the data.
@@ -28,6 +46,23 @@ class Clusterer:
             a loaded model from the fastText library
             required fro the embedding of the text
 
+        cache : EmbeddingCache
+            an optional on disk cache of previously embedded strings,
+            checked before the model is called
+            (default=None)
+
+        projection : (numpy.ndarray, numpy.ndarray)
+            a projection fitted by an earlier Clusterer, reused instead of
+            fitting a new one when config['reduction'] is set
+            (default=None)
+
+        model_path : str
+            the path the model was loaded from. On the first tier the vectors
+            and linkage are saved to config['vectors'] and config['Z'] under
+            a key of the words and the model fingerprint, and loaded from
+            there when the key matches
+            (default=None)
+
         Returns
         -------
         Clusterer object
@@ -38,6 +73,7 @@ class Clusterer:
 
         self.config = config
         self.model = model
+        self.cache = cache
 
         try:
             self.words = loader.words
@@ -45,14 +81,82 @@ class Clusterer:
         except:
             raise Exception("Not text descriptions loaded")
 
-        self.vectors = self.embed(loader, model)
-        self.Z = self.link()
+        # the words of a collapsed tier come with their vectors and linkage
+        vectors = getattr(loader, 'vectors', None)
+        weights = getattr(loader, 'weights', None)
+        Z = getattr(loader, 'Z', None)
+
+        # the first tier can weight each word by how often it occurs
+        if weights is None and config['frequency_weights']:
+            weights = getattr(loader, 'counts', None)
+
+        self.projection = projection
+        self.weights = np.ones(len(self.words)) if weights is None \
+            else np.asarray(weights, dtype=np.float64)
+
+        # only the first tier is kept on disk, later ones depend on labels
+        keys = self.keys(model_path) if config['tier_counter'] == 0 \
+            and model_path else {}
+
+        if vectors is None:
+            if 'vectors' in keys:
+                vectors = load_array(config['vectors'], keys['vectors'])
+
+            if vectors is None:
+                vectors = self.embed(loader, model)
+                if 'vectors' in keys:
+                    save_array(config['vectors'], keys['vectors'], vectors)
+            else:
+                print(f"    ** Loaded vectors from {config['vectors']}")
+
+            # optionally project onto fewer dimensions before linking
+            if config['reduction']:
+                if self.projection is None:
+                    print("    ** Fitting dimensionality reduction")
+                    self.projection = fit_projection(
+                        vectors,
+                        method=config['reduction'],
+                        dim=config['reduction_dim'],
+                        variance=config['reduction_variance'])
+                vectors = project(vectors, self.projection)
+                print(f"    ** Reduced to {vectors.shape[1]} dimensions")
+
+        if Z is None and 'Z' in keys:
+            Z = load_array(config['Z'], keys['Z'])
+            if Z is not None:
+                print(f"    ** Loaded linkage from {config['Z']}")
+
+        # link the full precision vectors as well when asked to, so that the
+        # cost of storing them at a lower precision can be measured
+        precision = config['vector_precision']
+        if config['precision_check'] and precision != 'float32' \
+                and Z is None:
+            reference = H.linkage(vectors, 'ward') if self.unweighted() \
+                else ward_linkage(vectors, weights=self.weights)
+        else:
+            reference = None
+
+        self.vectors = quantise(vectors, precision)
+        del vectors
+
+        if Z is None:
+            self.Z = self.link()
+            if 'Z' in keys:
+                save_array(config['Z'], keys['Z'], self.Z.values)
+        else:
+            self.Z = pd.DataFrame(
+                Z, columns=('node1', 'node2', 'distance', 'count'))
         self.counts = self.count()
 
+        if reference is not None:
+            self.agreement = self.compare(reference)
+            print(f"    ** Cluster agreement of {precision} with float32 "
+                  f"(adjusted rand index): {self.agreement:.4f}")
+
     # -- Functions ------------------------------------------------------------
     def count(self):
         """
-        Count the unique strings
+        Count the unique strings, by the weight each one carries
 
         Returns
         -------
@@ -62,14 +166,57 @@ class Clusterer:
         """
         freq = {}
 
-        for desc in self.words:
-            if desc in freq:
-                freq[desc] += 1
-            else:
-                freq[desc] = 1
+        for desc, weight in zip(self.words, self.weights):
+            freq[desc] = freq.get(desc, 0) + weight
 
         return freq
 
+    def unweighted(self):
+        """
+        Whether every word carries a weight of one, as scipy's linkage
+        assumes
+        """
+        return bool(np.all(self.weights == 1))
+
+    def keys(self, model_path):
+        """
+        Content keys of the vectors and linkage of the words, for the
+        config['vectors'] and config['Z'] paths that are set
+
+        The keys cover the words in their order, the fingerprint of the model
+        and the settings each array depends on, so that a stored array is
+        only reused when it would be computed again the same way.
+
+        Parameters
+        ----------
+        model_path : str
+            the path the model was loaded from
+
+        Returns
+        -------
+        dict
+            the key for each of 'vectors' and 'Z' that has a path
+
+        """
+        if not (self.config['vectors'] or self.config['Z']):
+            return {}
+
+        embedding = [fingerprint(model_path)] + [
+            self.config[k] for k in ('embed_mode', 'token_idf')]
+        linkage = embedding + [
+            self.config[k] for k in ('reduction', 'reduction_dim',
+                                     'reduction_variance', 'vector_precision',
+                                     'linkage_engine', 'linkage_buckets')] \
+            + [hashlib.sha1(self.weights.tobytes()).hexdigest()]
+
+        keys = {}
+        if self.config['vectors']:
+            keys['vectors'] = content_key(self.words, *embedding)
+        if self.config['Z']:
+            keys['Z'] = content_key(self.words, *linkage)
+
+        return keys
+
     def embed(self, loader, model):
         """
         Embedd the words into the vector space using the given model
@@ -85,20 +232,37 @@ class Clusterer:
 
         Returns
         -------
-        Clusterer object
+        numpy.ndarray
+            a C-contiguous float32 matrix, row i holds the vector of
+            self.words[i]
 
         """
         print("    ** Embedding words")
 
-        words = loader.words
-        vectors = [model.get_word_vector(word) for word in words]
+        kwargs = {'cache': self.cache,
+                  'workers': self.config['embed_workers'],
+                  'batch': self.config['embed_batch'],
+                  'pool': self.config['embed_pool']}
+
+        if self.config['embed_mode'] == 'tokens':
+            return embed_tokens(loader.words,
+                                model,
+                                idf=self.config['token_idf'],
+                                **kwargs)
 
-        return [(w, *v) for w, v in zip(words, vectors)]
+        return embed(loader.words, model, **kwargs)
 
     def link(self):
         """
         Perform ward linkage
 
+        config['linkage_engine'] picks between scipy, which needs the full
+        condensed distance matrix, and the nearest neighbour chain of
+        ward_linkage, which reads the vectors in blocks and only keeps the
+        centroids of merged clusters, and the approximate two_level_linkage,
+        which links k-means buckets of the words separately. Weighted words
+        are always linked by ward_linkage or two_level_linkage.
+
         Returns
         -------
         pd.DataFrame of sequential ward linked nodes, distance and count of leave
@@ -106,12 +270,46 @@ class Clusterer:
 
         """
         print("    ** Performing linkage")
-        df = pd.DataFrame(self.vectors)
-        Z = H.linkage(df.iloc[:, 2:], 'ward')
+        weights = None if self.unweighted() else self.weights
+
+        if self.config['linkage_engine'] == 'twolevel':
+            Z = two_level_linkage(self.vectors,
+                                  self.config['linkage_buckets'],
+                                  self.config['distance'],
+                                  weights=weights,
+                                  workers=self.config['linkage_workers'])
+        elif self.config['linkage_engine'] == 'nnchain' \
+                or weights is not None:
+            # scipy can not weight observations
+            Z = ward_linkage(self.vectors, weights=weights)
+        else:
+            Z = H.linkage(np.asarray(self.vectors), 'ward')
         Z = pd.DataFrame(Z, columns=('node1', 'node2', 'distance', 'count'))
 
         return Z
 
+    def compare(self, reference):
+        """
+        Measure how well the clusters at the current distance agree with
+        those of another linkage of the same words
+
+        Parameters
+        ----------
+        reference : numpy.ndarray
+            a linkage matrix to compare against
+
+        Returns
+        -------
+        float
+            the adjusted rand index of the two flat clusterings, 1 when they
+            are identical
+
+        """
+        distance = self.config['distance']
+        return adjusted_rand_score(
+            H.fcluster(reference, distance, 'distance'),
+            H.fcluster(self.Z.values, distance, 'distance'))
+
 
 # -- Boilerplate --------------------------------------------------------------
 if __name__ == '__main__':
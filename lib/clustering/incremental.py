@@ -0,0 +1,167 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+import scipy.sparse as sp
+
+# project
+from .ward import label, ward_linkage
+
+
+# -- Definitions --------------------------------------------------------------
+def collapse(words, vectors, weights, Z, mapping, tolerance=1e-9):
+    """
+    Carry a Ward linkage over to the next tier without linking it again.
+
+    Every word is renamed through mapping, and the words that end up with the
+    same name are collapsed into a single node at their weighted centroid,
+    weighted by their total weight. Ward distances only depend on centroids
+    and weights, so collapsing a whole subtree of the dendrogram (an accepted
+    cluster with a label of its own) leaves every merge above it unchanged
+    and its rows are simply dropped.
+
+    Only names shared by words from different subtrees, such as two clusters
+    given the same label, move points, and the merges involving them are
+    dropped. Dropping a merge frees its other side, which may then be closer
+    to some node than that node's recorded merge. So a merge is only kept if
+    it does not involve a moved node and is lower than both the nearest
+    neighbour of any moved node and every dropped merge; below that height
+    nothing has changed, and these are still the merges Ward would make.
+    The nodes left after them are merged again with the Lance-Williams
+    updates of ward_linkage.
+
+    Parameters
+    ----------
+    words : [str]
+        the words of the current tier
+
+    vectors : numpy.ndarray
+        the (n, dim) vectors of the words
+
+    weights : numpy.ndarray
+        the weight of each word
+
+    Z : numpy.ndarray
+        the (n - 1, 4) Ward linkage of the words, with monotone distances
+
+    mapping : dict
+        the new name of the words that are renamed, the others keep their
+        own
+
+    tolerance : float
+        a relative margin kept below the nearest moved node and the lowest
+        dropped merge, so that rounding can not keep a merge that would
+        change
+        (default=1e-9)
+
+    Returns
+    -------
+    ([str], numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        the words of the next tier, their vectors, their weights and their
+        linkage matrix
+
+    """
+    n = len(words)
+
+    index = {}
+    group = np.array([index.setdefault(mapping.get(word, word), len(index))
+                      for word in words])
+    collapsed = list(index)
+    m = len(collapsed)
+
+    weights = np.asarray(weights, dtype=np.float64)
+    members = np.bincount(group, minlength=m)
+    mass = np.bincount(group, weights=weights, minlength=m)
+    total = sp.csr_matrix((weights, (group, np.arange(n))), shape=(m, n))
+    centroids = (total @ np.asarray(vectors, dtype=np.float64)) \
+        / mass[:, None]
+
+    if m == 1:
+        return collapsed, centroids.astype(np.float32), mass, \
+            np.zeros((0, 4))
+
+    left = Z[:, 0].astype(int)
+    right = Z[:, 1].astype(int)
+
+    # the group below each node, -1 when it holds more than one, and the
+    # number of leaves and lowest group below it
+    below = np.concatenate([group, np.empty(n - 1, dtype=int)])
+    leaves = np.ones(2 * n - 1, dtype=int)
+    rep = below.copy()
+    for k, (a, b) in enumerate(zip(left.tolist(), right.tolist()), n):
+        below[k] = below[a] if below[a] == below[b] else -1
+        leaves[k] = leaves[a] + leaves[b]
+        rep[k] = min(rep[a], rep[b])
+
+    # groups that are not a whole subtree of their own move the tree
+    pure = np.flatnonzero(below >= 0)
+    whole = np.zeros(m, dtype=bool)
+    whole[below[pure][leaves[pure] == members[below[pure]]]] = True
+    moved = np.flatnonzero(~whole)
+
+    dirty = np.concatenate([~whole[group], np.zeros(n - 1, dtype=bool)])
+    for k, (a, b) in enumerate(zip(left.tolist(), right.tolist()), n):
+        dirty[k] = dirty[a] or dirty[b]
+
+    # merges involving a moved node can not be closer than its nearest
+    # neighbour, and the merges that are dropped free up their other side
+    # from their height on
+    dropped = (below[n:] < 0) & dirty[n:]
+    nearest = Z[dropped, 2].min(initial=np.inf)
+    if len(moved):
+        norms = np.einsum('ij,ij->i', centroids, centroids)
+        for start in range(0, len(moved), 1024):
+            block = moved[start:start + 1024]
+            d2 = norms[block, None] - 2 * centroids[block] @ centroids.T \
+                + norms
+            d2 *= 2 * mass[block, None] * mass / (mass[block, None] + mass)
+            d2[np.arange(len(block)), block] = np.inf
+            nearest = min(nearest, np.sqrt(max(d2.min(), 0)))
+    nearest *= 1 - tolerance
+
+    keep = (below[n:] < 0) & ~dirty[n:] & (Z[:, 2] < nearest)
+    rows = [(rep[a], rep[b], height) for a, b, height
+            in zip(left[keep], right[keep], Z[keep, 2])]
+
+    # the roots left after the kept merges, named by their lowest group
+    root = np.arange(m)
+
+    def find(x):
+        while root[x] != x:
+            root[x] = root[root[x]]
+            x = root[x]
+        return x
+
+    for a, b, _ in rows:
+        a, b = find(a), find(b)
+        root[max(a, b)] = min(a, b)
+    root = np.array([find(g) for g in range(m)])
+    roots, inverse = np.unique(root, return_inverse=True)
+
+    if len(roots) > 1:
+        weight = np.bincount(inverse, weights=mass)
+        merge = sp.csr_matrix((mass, (inverse, np.arange(m))),
+                              shape=(len(roots), m))
+        top = ward_linkage((merge @ centroids) / weight[:, None],
+                           weights=weight)
+        rep = list(roots)
+        for a, b, height, _ in top:
+            a, b = rep[int(a)], rep[int(b)]
+            rows.append((a, b, height))
+            rep.append(min(a, b))
+
+    print(f"    ** Collapsed {n} items into {m}, "
+          f"relinked {len(roots) - 1} of {m - 1} merges")
+
+    linked = np.zeros((m - 1, 4))
+    linked[:, :3] = rows
+    linked = linked[np.argsort(linked[:, 2], kind='mergesort')]
+    label(linked, m)
+
+    return collapsed, centroids.astype(np.float32), mass, linked
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,95 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import hashlib
+import json
+import os
+
+# third party
+import numpy as np
+
+
+# -- Definitions --------------------------------------------------------------
+def content_key(words, *settings):
+    """
+    Hash an ordered list of words together with the settings that produced
+    an array from them
+
+    Parameters
+    ----------
+    words : [str]
+        the words, in the order of the rows of the array
+
+    settings
+        any json serialisable values the array depends on, such as the model
+        fingerprint
+
+    Returns
+    -------
+    str
+        a hex digest that changes with the words, their order or the settings
+
+    """
+    h = hashlib.sha1(json.dumps(settings).encode())
+    for word in words:
+        h.update(word.encode())
+        h.update(b'\0')
+
+    return h.hexdigest()
+
+
+def save_array(path, key, array):
+    """
+    Save an array with its content key, replacing the file in a single step
+
+    Parameters
+    ----------
+    path : str
+        the file to write
+
+    key : str
+        the content key of the array, see content_key
+
+    array : numpy.ndarray
+        the array to save
+
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, key=np.array(key), array=np.asarray(array))
+    os.replace(tmp, path)
+
+
+def load_array(path, key):
+    """
+    Load an array saved by save_array if it was saved under the same key
+
+    Parameters
+    ----------
+    path : str
+        the file to read
+
+    key : str
+        the content key the array has to match
+
+    Returns
+    -------
+    numpy.ndarray / None
+        the array, or None if there is no file or it holds another array
+
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as saved:
+        if str(saved['key']) != key:
+            return None
+        return saved['array']
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,216 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+from concurrent.futures import ThreadPoolExecutor
+
+# third party
+import numpy as np
+import scipy.cluster.hierarchy as H
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.neighbors import NearestNeighbors
+
+# project
+from .ward import label, ward_linkage
+
+
+# -- Definitions --------------------------------------------------------------
+def merges(Z, leaves):
+    """
+    Express the rows of a linkage matrix by a representative observation of
+    each side, the form label expects
+
+    Parameters
+    ----------
+    Z : numpy.ndarray
+        a linkage matrix over len(leaves) observations
+
+    leaves : numpy.ndarray
+        the global index of each of the observations
+
+    Returns
+    -------
+    (list, int)
+        the (representative, representative, height) merges and the
+        representative of the root
+
+    """
+    rep = list(leaves)
+    rows = []
+
+    for a, b, height, _ in Z:
+        x, y = rep[int(a)], rep[int(b)]
+        rows.append((x, y, height))
+        rep.append(min(x, y))
+
+    return rows, rep[-1]
+
+
+def split_rate(vectors, buckets, distance, sample=1000, seed=0):
+    """
+    Estimate how often two observations closer than the cut distance were
+    put in different buckets, and so can no longer end up in the same
+    cluster.
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray
+        the (n, dim) observations
+
+    buckets : numpy.ndarray
+        the bucket of each observation
+
+    distance : float
+        the distance the tree will be cut at
+
+    sample : int
+        the number of observations whose neighbourhoods are checked
+        (default=1000)
+
+    seed : int
+        the random seed
+        (default=0)
+
+    Returns
+    -------
+    (float, int)
+        the fraction of the pairs found that were split and the number of
+        pairs found
+
+    """
+    rng = np.random.RandomState(seed)
+    picked = rng.choice(len(vectors), min(sample, len(vectors)), replace=False)
+
+    neighbours = NearestNeighbors(radius=distance).fit(vectors)
+    found = neighbours.radius_neighbors(vectors[picked],
+                                        return_distance=False)
+
+    pairs = 0
+    split = 0
+    for i, near in zip(picked, found):
+        near = near[near != i]
+        pairs += len(near)
+        split += np.count_nonzero(buckets[near] != buckets[i])
+
+    return (split / pairs if pairs else 0.0), pairs
+
+
+def two_level_linkage(vectors,
+                      buckets,
+                      distance,
+                      weights=None,
+                      workers=1,
+                      sample=1000,
+                      seed=0):
+    """
+    Approximate Ward linkage for very large inputs.
+
+    The observations are first partitioned into coarse buckets with
+    mini-batch k-means, then each bucket is Ward linked on its own, in
+    parallel. The bucket trees are joined at the top by a Ward linkage of
+    the bucket centroids, weighted by their sizes. Heights are kept
+    monotone, so the result is a valid linkage matrix over all the
+    observations that can be cut like any other.
+
+    Observations in different buckets can only meet above every height in
+    their two buckets, so some pairs closer than the cut distance end up
+    in different clusters. The rate at which that happens is estimated on a
+    sample and printed.
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray / QuantisedVectors
+        the (n, dim) observations
+
+    buckets : int
+        the number of coarse buckets
+
+    distance : float
+        the distance the tree will be cut at, used for the split estimate
+
+    weights : numpy.ndarray
+        an optional positive weight for each observation, see ward_linkage
+        (default=None)
+
+    workers : int
+        the number of threads linking the buckets
+        (default=1)
+
+    sample : int
+        the number of observations used for the split estimate
+        (default=1000)
+
+    seed : int
+        the random seed
+        (default=0)
+
+    Returns
+    -------
+    numpy.ndarray
+        an (n - 1, 4) linkage matrix in the format of
+        scipy.cluster.hierarchy.linkage
+
+    """
+    X = np.asarray(vectors, dtype=np.float32)
+    n = len(X)
+
+    kmeans = MiniBatchKMeans(n_clusters=min(buckets, n),
+                             random_state=seed,
+                             n_init=3)
+    assigned = kmeans.fit_predict(X, sample_weight=weights)
+    weights = np.ones(n) if weights is None \
+        else np.asarray(weights, dtype=np.float64)
+    members = [np.flatnonzero(assigned == b)
+               for b in np.unique(assigned)]
+
+    print(f"    ** Linking {len(members)} buckets "
+          f"(largest {max(len(m) for m in members)} items)")
+
+    def link(leaves):
+        if len(leaves) < 2:
+            return [], leaves[0], 0.0
+        w = weights[leaves]
+        Z = H.linkage(X[leaves], 'ward') if np.all(w == 1) \
+            else ward_linkage(X[leaves], weights=w)
+        rows, root = merges(Z, leaves)
+        return rows, root, Z[-1, 2]
+
+    with ThreadPoolExecutor(max(workers, 1)) as executor:
+        linked = list(executor.map(link, members))
+
+    rows = [row for bucket, _, _ in linked for row in bucket]
+
+    # join the buckets with a weighted Ward linkage of their centroids
+    if len(members) > 1:
+        sizes = np.array([weights[m].sum() for m in members])
+        centroids = np.array([weights[m] @ X[m] for m in members]) \
+            / sizes[:, None]
+        Z = ward_linkage(centroids, weights=sizes)
+
+        rep = [root for _, root, _ in linked]
+        top = [height for _, _, height in linked]
+        for a, b, height, _ in Z:
+            a, b = int(a), int(b)
+            # a parent can never sit below its children
+            height = max(height, top[a], top[b])
+            rows.append((rep[a], rep[b], height))
+            rep.append(min(rep[a], rep[b]))
+            top.append(height)
+
+    Z = np.zeros((n - 1, 4))
+    Z[:, :3] = rows
+    # children always come before their parents in rows, so a stable sort
+    # keeps them in that order when heights are tied
+    Z = Z[np.argsort(Z[:, 2], kind='mergesort')]
+    label(Z, n)
+
+    rate, pairs = split_rate(X, assigned, distance, sample, seed)
+    print(f"    ** {rate:.2%} of {pairs} sampled pairs within distance "
+          f"{distance} were split across buckets")
+
+    return Z
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,224 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+
+
+# -- Definitions --------------------------------------------------------------
+def label(Z, n):
+    """
+    Turn merges recorded by cluster position into scipy's linkage format,
+    where the cluster formed in row i is numbered n + i. This follows the
+    union find relabelling of scipy.cluster.hierarchy.
+
+    Parameters
+    ----------
+    Z : numpy.ndarray
+        (n - 1, 4) merges sorted by distance, updated in place
+
+    n : int
+        the number of observations
+
+    Returns
+    -------
+    None
+
+    """
+    parent = np.arange(2 * n - 1)
+    size = np.ones(2 * n - 1, dtype=np.int64)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        # compress the path for the next lookups
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for i in range(n - 1):
+        x, y = find(int(Z[i, 0])), find(int(Z[i, 1]))
+        Z[i, 0], Z[i, 1] = min(x, y), max(x, y)
+        parent[x] = parent[y] = n + i
+        size[n + i] = size[x] + size[y]
+        Z[i, 3] = size[n + i]
+
+
+def ward_linkage(vectors, weights=None, dtype=None, block=4096):
+    """
+    Exact Ward linkage without a pairwise distance matrix.
+
+    Uses the nearest neighbour chain algorithm, as scipy does, but works
+    from the cluster centroids instead of the O(n^2) condensed distance
+    matrix. The Ward distance between clusters a and b is
+
+        sqrt(2 * na * nb / (na + nb)) * |ca - cb|
+
+    which is what the Lance-Williams updates of scipy compute, so merging
+    two clusters only needs their weighted mean. The observations are never
+    copied: a cluster of one is read from vectors, in blocks, whenever its
+    distances are needed, and only the clusters formed by merges keep a
+    centroid of their own. Besides those the memory is a few vectors of
+    length n, so a memory-mapped or quantised matrix stays on disk or at
+    its reduced precision.
+
+    The nearest neighbour of the tip of the chain is found from the squared
+    differences to every centroid, never from the expansion of the norms,
+    which would lose the precision that decides between close candidates.
+    The distances that decide whether the chain grows or merges, and the
+    recorded heights, are computed the same way whichever of the two
+    clusters is asked about, which guarantees that the chain cannot cycle.
+
+    The merges follow scipy, breaking ties towards the previous element of
+    the chain and then the lowest index. The heights agree with scipy to
+    rounding, but scipy reaches them through different arithmetic, so where
+    two candidates are equally near up to rounding, as happens with
+    duplicated or rounded observations, either may be merged first. The
+    flat clusters then differ only in how such ties are resolved.
+
+    Observations can be given weights, in which case each one acts as a
+    cluster of that size from the start (the counts in the fourth column
+    still count observations).
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray / numpy.memmap / QuantisedVectors
+        the (n, dim) observations
+
+    weights : numpy.ndarray
+        an optional positive weight for each observation
+        (default=None)
+
+    dtype : numpy.dtype
+        the type the distances are computed in, that of the observations
+        (and at least float32) if not given
+        (default=None)
+
+    block : int
+        the number of observations read at a time
+        (default=4096)
+
+    Returns
+    -------
+    numpy.ndarray
+        an (n - 1, 4) linkage matrix in the format of
+        scipy.cluster.hierarchy.linkage
+
+    """
+    n = len(vectors)
+    if n < 2:
+        raise ValueError('Ward linkage needs at least 2 observations')
+
+    if dtype is None:
+        dtype = np.result_type(getattr(vectors, 'dtype', np.float32),
+                               np.float32)
+
+    size = np.ones(n, dtype=dtype) if weights is None \
+        else np.asarray(weights, dtype=dtype).copy()
+    active = np.ones(n, dtype=bool)
+
+    # the row in merged of the centroid of each cluster formed by a merge,
+    # -1 for the observations that have not been merged yet
+    slot = np.full(n, -1)
+    merged = np.empty((0, vectors.shape[1]), dtype=dtype)
+    free = []
+
+    def centroid(x):
+        if slot[x] < 0:
+            return np.asarray(vectors[x:x + 1], dtype=dtype)[0]
+        return merged[slot[x]]
+
+    def squared(points, c):
+        diff = points - c
+        return np.einsum('ij,ij->i', diff, diff)
+
+    def exact(a, b):
+        # the same arithmetic whichever way round the pair is asked for
+        a, b = min(a, b), max(a, b)
+        return np.sqrt(2 * size[a] * size[b] / (size[a] + size[b])
+                       * squared(centroid(a)[None], centroid(b))[0])
+
+    def nearest(x):
+        c = centroid(x)
+        d2 = np.full(n, np.inf, dtype=dtype)
+
+        single = np.flatnonzero(active & (slot < 0))
+        for start in range(0, len(single), block):
+            rows = single[start:start + block]
+            d2[rows] = squared(np.asarray(vectors[rows], dtype=dtype), c)
+
+        formed = np.flatnonzero(active & (slot >= 0))
+        d2[formed] = squared(merged[slot[formed]], c)
+
+        live = np.flatnonzero(active)
+        d2[live] *= 2 * size[live] * size[x] / (size[live] + size[x])
+        d2[x] = np.inf
+        # argmin takes the lowest index among ties, as scipy does
+        return int(np.argmin(d2))
+
+    Z = np.empty((n - 1, 4))
+    chain = []
+
+    for k in range(n - 1):
+        if not chain:
+            chain.append(int(np.argmax(active)))
+
+        # follow the nearest neighbours until two of them are mutual
+        while True:
+            x = chain[-1]
+            y = nearest(x)
+            current = exact(x, y)
+
+            # prefer the previous element of the chain to avoid cycles
+            if len(chain) > 1:
+                previous = exact(x, chain[-2])
+                if previous <= current:
+                    y, current = chain[-2], previous
+                    break
+
+            chain.append(y)
+
+        chain = chain[:-2]
+
+        if x > y:
+            x, y = y, x
+
+        # the merged cluster takes the place of y, label fills in the count
+        total = size[x] + size[y]
+        Z[k, :3] = x, y, current
+
+        c = (size[x] * centroid(x) + size[y] * centroid(y)) / total
+
+        # reuse the centroid row of either side, or take a new one
+        if slot[y] < 0:
+            if slot[x] >= 0:
+                slot[y] = slot[x]
+            else:
+                if not free:
+                    # every row is taken, double them
+                    grown = np.empty((2 * len(merged) or 1, merged.shape[1]),
+                                     dtype=dtype)
+                    grown[:len(merged)] = merged
+                    free = list(range(len(grown) - 1, len(merged) - 1, -1))
+                    merged = grown
+                slot[y] = free.pop()
+        elif slot[x] >= 0:
+            free.append(slot[x])
+        slot[x] = -1
+
+        merged[slot[y]] = c
+        size[y] = total
+        size[x] = 0
+        active[x] = False
+
+    # the chain finds merges out of order, scipy sorts them stably by height
+    Z = Z[np.argsort(Z[:, 2], kind='mergesort')]
+    label(Z, n)
+
+    return Z
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
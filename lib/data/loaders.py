@@ -12,11 +12,17 @@ class SimpleLoader:
     """
     A simplified version of the Loader class responsible for picking
     up the data after one depth iteration.
+
+    The vectors, weights and linkage of the words can be passed on when
+    they are already known, Clusterer then uses them as they are.
     """
 
-    def __init__(self, words, linked):
+    def __init__(self, words, linked, vectors=None, weights=None, Z=None):
         self.words = words
         self.linked = linked
+        self.vectors = vectors
+        self.weights = weights
+        self.Z = Z
         print('_'*79)
         print(f"    ** Reloaded {len(self.words)} items")
 
@@ -54,9 +60,9 @@ class Loader:
         if data:
             if all([len(sublist) == 0 for sublist in data]):
                 raise ValueError('Sublists in the given data are empty')
-            self.words, self.linked = self.clean(data)
+            self.words, self.linked, self.counts = self.clean(data)
         else:
-            self.words, self.linked = self.clean(self.load())
+            self.words, self.linked, self.counts = self.clean(self.load())
 
         # export the original desc
         pd.DataFrame(self.words).to_csv(
@@ -96,7 +102,10 @@ class Loader:
 
         Returns
         -------
-        list
+        (list, dict, list)
+            the unique cleaned strings, a lookup of the cleaned version of
+            each original string and the number of times each unique
+            string occurs
 
         """
 
@@ -135,7 +144,13 @@ class Loader:
         words = [word for word in words if word]  # discard empty strings
 
         print(f"    ** Loaded {len(words)} items")
-        return list(set(words)), lookup
+
+        # keep the first occurrence of each, so the order is reproducible
+        counts = {}
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+
+        return list(counts), lookup, list(counts.values())
 
 
 # -- Boilerplate --------------------------------------------------------------
@@ -0,0 +1,8 @@
+from .embed import embed, embed_batched
+from .cache import EmbeddingCache, MemoryCache, fingerprint
+from .tokens import embed_tokens
+from .subword import SubwordModel, export_subwords
+from .quantise import QuantisedVectors, quantise, blocks
+from .reduction import fit_projection, project
+from .backends import VecModel, ArrayModel, load_model
+from .registry import ModelRegistry, registry
@@ -0,0 +1,251 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import json
+import os
+
+# third party
+import fastText as ft
+import numpy as np
+
+# project
+from .subword import SubwordModel, params_path
+
+
+# -- Definitions --------------------------------------------------------------
+#
+# A backend is anything that can be used in place of a loaded fastText model.
+# It has to provide
+#
+#   get_dimension()        -> int
+#   get_word_vector(word)  -> numpy.ndarray of shape (dim,)
+#
+# and may provide get_word_vectors(words) to embed a whole batch at once.
+# The word list backends below only know the words in their vocabulary and
+# return a vector of zeros for any other string.
+
+
+class VecModel:
+    """
+    A backend reading word vectors from a fastText .vec text file.
+
+    The file is scanned once to find where each line starts and the offsets
+    are saved next to it, so later loads only read that index. Vectors are
+    then read straight from the lines that are asked for, the rest of the
+    file never has to be in memory.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor for the VecModel object.
+
+        Parameters
+        ----------
+        path : str
+            a path to a .vec file, a header line of 'count dim' followed by
+            one 'word x1 ... xdim' line per word
+
+        Returns
+        -------
+        VecModel object
+
+        """
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + '.index.json'
+
+        if (os.path.exists(self.index_path) and
+                os.path.getmtime(self.index_path) >= os.path.getmtime(path)):
+            with open(self.index_path) as f:
+                index = json.load(f)
+        else:
+            index = self.build_index()
+
+        self.dim = index['dim']
+        self.vocab = {w: i for i, w in enumerate(index['words'])}
+        self.offsets = np.array(index['offsets'], dtype=np.int64)
+
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def build_index(self):
+        """
+        Scan the file for the byte offset of every line and save the result
+
+        Returns
+        -------
+        dict
+            with the dimension, the words and the line offsets (one more
+            offset than words, marking the end of the last line)
+
+        """
+        words = []
+        offsets = []
+
+        with open(self.path, 'rb') as f:
+            dim = int(f.readline().split()[1])
+            offset = f.tell()
+            for line in f:
+                words.append(line[:line.index(b' ')].decode('utf-8'))
+                offsets.append(offset)
+                offset += len(line)
+        offsets.append(offset)
+
+        index = {'dim': dim, 'words': words, 'offsets': offsets}
+        with open(self.index_path, 'w') as f:
+            json.dump(index, f)
+
+        return index
+
+    def get_dimension(self):
+        return self.dim
+
+    def get_word_vector(self, word):
+        return self.get_word_vectors([word])[0]
+
+    def get_word_vectors(self, words):
+        """
+        Read the vectors of a batch of words, in file order
+
+        Parameters
+        ----------
+        words : [str]
+            the strings to embed
+
+        Returns
+        -------
+        numpy.ndarray
+            a float32 matrix of shape (len(words), dim)
+
+        """
+        vectors = np.zeros((len(words), self.dim), dtype=np.float32)
+
+        found = sorted((self.vocab[w], i)
+                       for i, w in enumerate(words) if w in self.vocab)
+
+        for row, i in found:
+            start, stop = self.offsets[row], self.offsets[row + 1]
+            # pread leaves the file position alone, so threads can share it
+            line = os.pread(self.fd, int(stop - start), int(start))
+            vectors[i] = np.array(line.split()[1:self.dim + 1],
+                                  dtype=np.float32)
+
+        return vectors
+
+    def __del__(self):
+        if hasattr(self, 'fd'):
+            os.close(self.fd)
+
+
+class ArrayModel:
+    """
+    A backend for a .npy matrix of word vectors paired with a .vocab file
+    holding one word per line, line i naming row i. The matrix is
+    memory-mapped so only the rows asked for are read.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor for the ArrayModel object.
+
+        Parameters
+        ----------
+        path : str
+            a path to the .npy matrix, the vocabulary is read from the .vocab
+            file of the same name
+
+        Returns
+        -------
+        ArrayModel object
+
+        """
+        self.matrix = np.load(path, mmap_mode='r')
+
+        with open(vocab_path(path), encoding='utf-8') as f:
+            self.vocab = {w.rstrip('\n'): i for i, w in enumerate(f)}
+
+    def get_dimension(self):
+        return self.matrix.shape[1]
+
+    def get_word_vector(self, word):
+        return self.get_word_vectors([word])[0]
+
+    def get_word_vectors(self, words):
+        """
+        Gather the vectors of a batch of words from the matrix
+
+        Parameters
+        ----------
+        words : [str]
+            the strings to embed
+
+        Returns
+        -------
+        numpy.ndarray
+            a float32 matrix of shape (len(words), dim)
+
+        """
+        vectors = np.zeros((len(words), self.get_dimension()),
+                           dtype=np.float32)
+
+        found = [(self.vocab[w], i)
+                 for i, w in enumerate(words) if w in self.vocab]
+        if found:
+            rows, positions = map(list, zip(*sorted(found)))
+            vectors[positions] = self.matrix[rows]
+
+        return vectors
+
+
+def vocab_path(path):
+    """
+    Location of the vocabulary that goes with a .npy matrix of word vectors
+    """
+    return os.path.splitext(path)[0] + '.vocab'
+
+
+def load_npy(path):
+    """
+    Pick the backend for a .npy file from the file sitting next to it
+    """
+    if os.path.exists(params_path(path)):
+        return SubwordModel(path)
+    elif os.path.exists(vocab_path(path)):
+        return ArrayModel(path)
+
+    raise ValueError(
+        f'{path} needs either a .json file from export_subwords or a .vocab '
+        'file next to it')
+
+
+# loaders for each supported model file type
+BACKENDS = {
+    '.bin': ft.load_model,
+    '.ftz': ft.load_model,
+    '.vec': VecModel,
+    '.npy': load_npy,
+}
+
+
+def load_model(path):
+    """
+    Load a model with the backend matching its file extension, files with
+    any other extension are handed to fastText
+
+    Parameters
+    ----------
+    path : str
+        a path to a .bin fastText model, a .vec text file or a .npy matrix
+
+    Returns
+    -------
+    model object
+
+    """
+    extension = os.path.splitext(path)[1]
+
+    return BACKENDS.get(extension, ft.load_model)(path)
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,330 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import hashlib
+import json
+import os
+
+# third party
+import numpy as np
+
+
+# -- Definitions --------------------------------------------------------------
+def fingerprint(path, chunk=1 << 20):
+    """
+    Produce a short fingerprint of a model file.
+
+    Hashing a whole multi-gigabyte model would cost about as much as loading
+    it, so only the file size and the first and last chunk of bytes are
+    hashed. This is enough to tell apart different models and different
+    versions of the same model.
+
+    Parameters
+    ----------
+    path : str
+        a path to the model file
+
+    chunk : int
+        number of bytes hashed from each end of the file
+        (default=1MB)
+
+    Returns
+    -------
+    str
+        a 16 character hex digest
+
+    """
+    size = os.path.getsize(path)
+
+    h = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(chunk))
+        if size > chunk:
+            f.seek(-chunk, os.SEEK_END)
+            h.update(f.read(chunk))
+
+    return h.hexdigest()[:16]
+
+
+class MemoryCache:
+    """
+    An in memory store of embedded strings with the same interface as
+    EmbeddingCache, for caching that only has to last a single run.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, words, out):
+        """
+        Fill the rows of out for the words that are already cached and
+        return the positions of those that are not, see EmbeddingCache.get
+        """
+        missing = []
+
+        for i, word in enumerate(words):
+            vector = self.index.get(word)
+            if vector is None:
+                missing.append(i)
+            else:
+                out[i] = vector
+
+        self.hits += len(words) - len(missing)
+        self.misses += len(missing)
+
+        return missing
+
+    def update(self, words, vectors):
+        """
+        Add newly embedded strings to the cache
+        """
+        for word, vector in zip(words, vectors):
+            self.index.setdefault(word, vector)
+
+
+class EmbeddingCache:
+    """
+    A persistent store of embedded strings.
+
+    The vectors live in a flat float32 file that is memory-mapped for reads
+    and appended to in bulk. A json index maps each cleaned string to its row
+    and to the run in which it was last used, which drives the eviction once
+    the store grows past its size cap. Each model gets its own namespace,
+    derived from the fingerprint of the model file.
+
+    Eviction moves rows, so the compacted vectors are written to a new file
+    of the next generation and the index names the file its rows belong to.
+    The index is replaced last, so whenever a run stops the index and the
+    vectors it names agree.
+    """
+
+    def __init__(self, path, model_path, size=1000000):
+        """
+        Constructor for the EmbeddingCache object.
+
+        Parameters
+        ----------
+        path : str
+            a directory in which the cache is kept
+
+        model_path : str
+            the path of the model file the vectors come from, used to
+            namespace the cache
+
+        size : int
+            the maximum number of vectors kept on disk, the least recently
+            used are evicted beyond this point
+            (default=1000000)
+
+        Returns
+        -------
+        EmbeddingCache object
+
+        """
+        self.path = os.path.join(path, fingerprint(model_path))
+        self.size = size
+
+        os.makedirs(self.path, exist_ok=True)
+        self.index_path = os.path.join(self.path, 'index.json')
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                state = json.load(f)
+            self.dim = state['dim']
+            self.run = state['run'] + 1
+            self.index = state['index']
+            # caches from before generations were kept are generation 0
+            self.generation = state.get('generation', 0)
+        else:
+            self.dim = None
+            self.run = 0
+            self.index = {}
+            self.generation = 0
+
+        self.vectors_path = self.generation_path(self.generation)
+        self.tidy()
+
+        # keep track of how useful the cache has been during this run
+        self.hits = 0
+        self.misses = 0
+
+    def generation_path(self, generation):
+        """
+        The vector file of a generation of the cache
+        """
+        name = 'vectors.f32' if not generation \
+            else f'vectors.{generation}.f32'
+        return os.path.join(self.path, name)
+
+    def tidy(self):
+        """
+        Remove the vector files the index does not name, left behind by a
+        run that stopped part way through an eviction
+        """
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.startswith('vectors.') \
+                    and name.endswith(('.f32', '.f32.tmp')) \
+                    and path != self.vectors_path:
+                os.remove(path)
+
+    def rows(self):
+        """
+        Number of rows currently held in the vector file
+        """
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def vectors(self):
+        """
+        Memory-map the vector file
+
+        Returns
+        -------
+        numpy.memmap
+            a read only float32 matrix of shape (rows, dim)
+
+        """
+        return np.memmap(self.vectors_path,
+                         dtype=np.float32,
+                         mode='r',
+                         shape=(self.rows(), self.dim))
+
+    def get(self, words, out):
+        """
+        Fill the rows of out for the words that are already cached
+
+        Parameters
+        ----------
+        words : [str]
+            the strings to look up
+
+        out : numpy.ndarray
+            a matrix of shape (len(words), dim) to write the vectors into
+
+        Returns
+        -------
+        list
+            the positions in words that were not found in the cache
+
+        """
+        if self.dim not in (None, out.shape[1]):
+            raise ValueError(
+                f'Cached vectors have {self.dim} dimensions, '
+                f'the model has {out.shape[1]}')
+
+        found = []
+        rows = []
+        missing = []
+
+        for i, word in enumerate(words):
+            entry = self.index.get(word)
+            if entry is None:
+                missing.append(i)
+            else:
+                entry[1] = self.run
+                found.append(i)
+                rows.append(entry[0])
+
+        if found:
+            # a single sorted gather keeps the reads on the map sequential
+            order = np.argsort(rows)
+            rows = np.asarray(rows)[order]
+            found = np.asarray(found)[order]
+            out[found] = self.vectors()[rows]
+
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        return missing
+
+    def update(self, words, vectors):
+        """
+        Append newly embedded strings to the cache in one write, evict the
+        least recently used rows if the size cap is exceeded and save the
+        index.
+
+        Parameters
+        ----------
+        words : [str]
+            the strings that were embedded
+
+        vectors : numpy.ndarray
+            their vectors, row i belonging to words[i]
+
+        """
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+
+        # only store the first occurrence of a repeated string
+        new = {}
+        for i, word in enumerate(words):
+            if word not in self.index and word not in new:
+                new[word] = i
+
+        if new:
+            start = self.rows()
+            block = np.ascontiguousarray(
+                vectors[list(new.values())], dtype=np.float32)
+            with open(self.vectors_path, 'ab') as f:
+                f.write(block.tobytes())
+
+            for row, word in enumerate(new, start):
+                self.index[word] = [row, self.run]
+
+        if len(self.index) > self.size:
+            self.evict()
+
+        self.save()
+
+    def evict(self):
+        """
+        Drop the least recently used strings until the cache is within its
+        size cap, compacting the vectors into the file of the next generation
+        and saving the index that names it.
+        """
+        keep = sorted(self.index.items(),
+                      key=lambda item: item[1][1],
+                      reverse=True)[:self.size]
+        keep.sort(key=lambda item: item[1][0])
+
+        block = np.array(self.vectors()[[entry[0] for _, entry in keep]])
+
+        # the rows move, so they go to a new file that only the new index
+        # names, and the old file stays valid until the index is replaced
+        previous = self.vectors_path
+        self.generation += 1
+        self.vectors_path = self.generation_path(self.generation)
+
+        tmp = self.vectors_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(block.tobytes())
+        os.replace(tmp, self.vectors_path)
+
+        self.index = {
+            word: [row, entry[1]] for row, (word, entry) in enumerate(keep)}
+        self.save()
+
+        os.remove(previous)
+
+    def save(self):
+        """
+        Write the index to disk, replacing the old one in a single step
+        """
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'dim': self.dim,
+                       'run': self.run,
+                       'generation': self.generation,
+                       'index': self.index},
+                      f)
+        os.replace(tmp, self.index_path)
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,209 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import multiprocessing as mp
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+# third party
+import numpy as np
+
+
+# -- Definitions --------------------------------------------------------------
+# state handed to forked worker processes, see embed_batched
+_shared = {}
+
+
+def _fill(words, model, out, start, stop):
+    """
+    Write the vectors of words[start:stop] into the same rows of out, in
+    one call for models that can embed a whole batch
+    """
+    if hasattr(model, 'get_word_vectors'):
+        out[start:stop] = model.get_word_vectors(words[start:stop])
+    else:
+        for i in range(start, stop):
+            out[i] = model.get_word_vector(words[i])
+
+
+def _fill_shared(start):
+    """
+    Worker process counterpart of _fill, writing into the shared memory
+    block set up by embed_batched
+    """
+    block = shared_memory.SharedMemory(name=_shared['name'])
+    out = np.ndarray(_shared['shape'], dtype=_shared['dtype'],
+                     buffer=block.buf)
+    _fill(_shared['words'],
+          _shared['model'],
+          out,
+          start,
+          min(start + _shared['batch'], len(_shared['words'])))
+    del out
+    block.close()
+
+
+def embed_batched(words, model, out, workers=1, batch=1024, pool='thread'):
+    """
+    Embed the words straight into the rows of out, splitting them into
+    batches that are spread across a pool of workers.
+
+    Threads share the model and the output matrix directly. Processes are
+    forked, so they inherit the loaded model without copying it, and write
+    into a shared memory block that is copied into out once all batches are
+    done.
+
+    Parameters
+    ----------
+    words : [str]
+        a list of strings to embed
+
+    model : fastText model
+        a loaded model from the fastText library
+
+    out : numpy.ndarray
+        a matrix of shape (len(words), dim), row i receives the vector of
+        words[i]
+
+    workers : int
+        the number of threads or processes to use, 1 embeds serially
+        (default=1)
+
+    batch : int
+        the number of strings handed to a worker at a time
+        (default=1024)
+
+    pool : str
+        either 'thread' or 'process'
+        (default='thread')
+
+    Returns
+    -------
+    None
+
+    """
+    n = len(words)
+    starts = range(0, n, batch)
+
+    if workers <= 1 or n <= batch:
+        _fill(words, model, out, 0, n)
+
+    elif pool == 'thread':
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(
+                lambda start: _fill(
+                    words, model, out, start, min(start + batch, n)),
+                starts))
+
+    elif pool == 'process':
+        block = shared_memory.SharedMemory(create=True, size=out.nbytes)
+        try:
+            _shared.update(name=block.name,
+                           shape=out.shape,
+                           dtype=out.dtype,
+                           words=words,
+                           model=model,
+                           batch=batch)
+            with mp.get_context('fork').Pool(workers) as processes:
+                processes.map(_fill_shared, starts)
+            out[:] = np.ndarray(out.shape, dtype=out.dtype, buffer=block.buf)
+        finally:
+            _shared.clear()
+            block.close()
+            block.unlink()
+
+    else:
+        raise ValueError(f"Unknown pool '{pool}', use 'thread' or 'process'")
+
+
+def embed(words,
+          model,
+          cache=None,
+          workers=1,
+          batch=1024,
+          pool='thread',
+          dtype=np.float32):
+    """
+    Embed the words into the vector space using the given model.
+
+    The vectors are written into a single preallocated, C-contiguous matrix
+    so that no intermediate (word, *vector) tuples or mixed type dataframes
+    are ever built. Row i of the matrix is the vector for words[i], the word
+    list itself acts as the index.
+
+    If an EmbeddingCache is given, the strings it already holds are read
+    from it and only the remaining ones are passed to the model. The newly
+    embedded vectors are then added to the cache in a single write.
+
+    Each distinct string is only embedded once, see embed_batched for the
+    workers, batch and pool settings.
+
+    Parameters
+    ----------
+    words : [str]
+        a list of strings to embed
+
+    model : fastText model
+        a loaded model from the fastText library
+        required for the embedding of the text
+
+    cache : EmbeddingCache
+        an optional on disk cache of previously embedded strings
+        (default=None)
+
+    workers : int
+        the number of threads or processes to embed with
+        (default=1)
+
+    batch : int
+        the number of strings handed to a worker at a time
+        (default=1024)
+
+    pool : str
+        either 'thread' or 'process'
+        (default='thread')
+
+    dtype : numpy.dtype
+        the type of the returned matrix
+        (default=numpy.float32)
+
+    Returns
+    -------
+    numpy.ndarray
+        a matrix of shape (len(words), model.get_dimension())
+
+    """
+    vectors = np.empty((len(words), model.get_dimension()), dtype=dtype)
+
+    if cache is None:
+        missing = range(len(words))
+    else:
+        missing = cache.get(words, vectors)
+
+    # map every missing position onto its distinct string
+    unique = {}
+    rows = [unique.setdefault(words[i], len(unique)) for i in missing]
+
+    block = np.empty((len(unique), vectors.shape[1]), dtype=dtype)
+
+    if unique:
+        start = time.time()
+        embed_batched(list(unique), model, block, workers, batch, pool)
+        elapsed = max(time.time() - start, 1e-9)
+
+        vectors[list(missing)] = block[rows]
+
+        print(f"    ** Embedded {len(unique)} strings "
+              f"({len(unique) / elapsed:.0f} vectors/sec)")
+
+    if cache is not None:
+        cache.update(list(unique), block)
+
+    return vectors
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,132 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+
+
+# -- Definitions --------------------------------------------------------------
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+class QuantisedVectors:
+    """
+    A matrix of vectors held at reduced precision.
+
+    float16 halves the memory of the float32 embeddings. int8 quarters it,
+    mapping each dimension symmetrically onto [-127, 127] with its own
+    scale. Rows are turned back into float32 when they are indexed, so the
+    matrix can be read in blocks without ever being fully expanded.
+    """
+
+    def __init__(self, vectors, precision='float16'):
+        """
+        Constructor for the QuantisedVectors object.
+
+        Parameters
+        ----------
+        vectors : numpy.ndarray
+            a float matrix of shape (n, dim)
+
+        precision : str
+            either 'float16' or 'int8'
+            (default='float16')
+
+        Returns
+        -------
+        QuantisedVectors object
+
+        """
+        self.precision = precision
+
+        if precision == 'float16':
+            self.scale = None
+            self.data = np.ascontiguousarray(vectors, dtype=np.float16)
+
+        elif precision == 'int8':
+            scale = np.abs(vectors).max(axis=0) / 127 if len(vectors) \
+                else np.ones(vectors.shape[1])
+            # a dimension that is zero throughout would divide by zero
+            self.scale = np.where(scale > 0, scale, 1).astype(np.float32)
+            self.data = np.rint(vectors / self.scale).astype(np.int8)
+
+        else:
+            raise ValueError(
+                f"Unknown precision '{precision}', use one of {PRECISIONS}")
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, rows):
+        """
+        Dequantise the selected rows back to float32
+        """
+        block = self.data[rows].astype(np.float32)
+        if self.scale is not None:
+            block *= self.scale
+        return block
+
+    def __array__(self, dtype=None, copy=None):
+        block = self[:]
+        return block if dtype is None else block.astype(dtype, copy=False)
+
+
+def quantise(vectors, precision='float32'):
+    """
+    Store the vectors at the given precision.
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray
+        a float32 matrix of shape (n, dim)
+
+    precision : str
+        one of 'float32', 'float16' or 'int8'. float32 returns the vectors
+        as they are
+        (default='float32')
+
+    Returns
+    -------
+    numpy.ndarray / QuantisedVectors
+
+    """
+    if precision == 'float32':
+        return vectors
+
+    return QuantisedVectors(vectors, precision)
+
+
+def blocks(vectors, size=4096):
+    """
+    Iterate over a matrix in float32 blocks of rows
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray / QuantisedVectors
+        the matrix to read
+
+    size : int
+        the number of rows per block
+        (default=4096)
+
+    Returns
+    -------
+    generator
+        of (first row, block) pairs
+
+    """
+    for start in range(0, len(vectors), size):
+        yield start, np.asarray(vectors[start:start + size], dtype=np.float32)
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -0,0 +1,112 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+from sklearn.utils.extmath import randomized_svd
+
+# project
+from .quantise import blocks
+
+
+# -- Definitions --------------------------------------------------------------
+def fit_projection(vectors, method='pca', dim=0, variance=0.0, seed=0):
+    """
+    Fit a linear projection of the vectors onto fewer dimensions.
+
+    'pca' keeps the leading principal components, found with a randomized
+    SVD. 'random' is a Gaussian random projection, which is data independent
+    and so needs no fitting beyond the choice of dimension.
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray / QuantisedVectors
+        the (n, dim) matrix to fit the projection on
+
+    method : str
+        either 'pca' or 'random'
+        (default='pca')
+
+    dim : int
+        the number of dimensions to project onto, 0 keeps them all for
+        'pca' and is not allowed for 'random'
+        (default=0)
+
+    variance : float
+        for 'pca' only, if above 0 keep the fewest components that explain
+        this fraction of the variance (within the first dim components)
+        (default=0.0)
+
+    seed : int
+        the random seed
+        (default=0)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        the mean and the (k, dim) components, a vector x is projected as
+        (x - mean) @ components.T
+
+    """
+    X = np.asarray(vectors, dtype=np.float32)
+    n, d = X.shape
+
+    if method == 'pca':
+        mean = X.mean(axis=0)
+        centred = X - mean
+        k = min(dim or d, n, d)
+
+        _, s, components = randomized_svd(centred, k, random_state=seed)
+
+        if variance:
+            explained = np.cumsum(s ** 2) / np.sum(centred ** 2)
+            k = min(int(np.searchsorted(explained, variance)) + 1, len(s))
+            components = components[:k]
+
+        return mean, components.astype(np.float32)
+
+    elif method == 'random':
+        if not dim:
+            raise ValueError(
+                'A random projection needs reduction_dim to be set')
+
+        rng = np.random.RandomState(seed)
+        components = rng.normal(0, 1 / np.sqrt(dim), (dim, d))
+
+        return np.zeros(d, dtype=np.float32), components.astype(np.float32)
+
+    else:
+        raise ValueError(
+            f"Unknown reduction '{method}', use 'pca' or 'random'")
+
+
+def project(vectors, projection):
+    """
+    Apply a projection from fit_projection, one block of rows at a time
+
+    Parameters
+    ----------
+    vectors : numpy.ndarray / QuantisedVectors
+        the (n, dim) matrix to project
+
+    projection : (numpy.ndarray, numpy.ndarray)
+        the mean and components returned by fit_projection
+
+    Returns
+    -------
+    numpy.ndarray
+        a C-contiguous float32 matrix of shape (n, k)
+
+    """
+    mean, components = projection
+    out = np.empty((len(vectors), len(components)), dtype=np.float32)
+
+    for start, block in blocks(vectors):
+        out[start:start + len(block)] = (block - mean) @ components.T
+
+    return out
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
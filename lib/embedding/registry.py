@@ -0,0 +1,167 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import collections
+import gc
+import os
+import threading
+
+# project
+from .backends import load_model
+
+
+# -- Definitions --------------------------------------------------------------
+class ModelRegistry:
+    """
+    A process wide store of loaded models, keyed by their path.
+
+    Models loaded through the registry are shared by every Optimus object
+    that asks for the same path. Outside of a session the Optimus objects
+    release their model once a run finishes, as they always have. Inside a
+    session (the registry used as a context manager) the models stay
+    resident between runs and are only released when the outermost session
+    exits, or when they are pushed out by the memory budget.
+
+        Example
+        ----------
+        with registry:
+            for batch in batches:
+                results.append(o(batch))
+    """
+
+    def __init__(self, loader=load_model, budget=0):
+        """
+        Constructor for the ModelRegistry object.
+
+        Parameters
+        ----------
+        loader : func
+            a function used to load a model given its path
+            (default=load_model)
+
+        budget : int
+            the number of bytes the resident models may take up, the least
+            recently used models are evicted beyond this point. 0 means
+            there is no limit. The in memory size of a model is estimated by
+            the size of its file.
+            (default=0)
+
+        Returns
+        -------
+        ModelRegistry object
+
+        """
+        self.loader = loader
+        self.budget = budget
+
+        # path -> (model, size), kept in order of last use
+        self.models = collections.OrderedDict()
+        self.depth = 0
+        self.lock = threading.RLock()
+
+    @property
+    def active(self):
+        """
+        Whether a session is currently open
+        """
+        return self.depth > 0
+
+    def loaded(self, path):
+        """
+        Check if the model for the given path is resident
+        """
+        return os.path.abspath(path) in self.models
+
+    def used(self):
+        """
+        The estimated number of bytes taken up by the resident models
+        """
+        return sum(size for _, size in self.models.values())
+
+    def load(self, path, budget=None):
+        """
+        Return the model for the given path, loading it only if it is not
+        already resident.
+
+        Parameters
+        ----------
+        path : str
+            a path to the model file
+
+        budget : int
+            overrides the budget of the registry for this load
+            (default=None)
+
+        Returns
+        -------
+        model object
+
+        """
+        key = os.path.abspath(path)
+        budget = self.budget if budget is None else budget
+
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key][0]
+
+            # leave a missing file for the loader to complain about
+            size = os.path.getsize(key) if os.path.exists(key) else 0
+
+            # make room before loading so two models never have to share
+            # the budget at the peak
+            if budget:
+                while self.models and self.used() + size > budget:
+                    self.evict()
+
+            model = self.loader(key)
+            self.models[key] = (model, size)
+
+            return model
+
+    def evict(self):
+        """
+        Drop the least recently used model
+        """
+        with self.lock:
+            self.models.popitem(last=False)
+        gc.collect()
+
+    def release(self, path=None):
+        """
+        Drop the model for the given path, or all models if no path is given
+
+        Parameters
+        ----------
+        path : str
+            a path to the model file
+            (default=None)
+
+        """
+        with self.lock:
+            if path is None:
+                self.models.clear()
+            else:
+                self.models.pop(os.path.abspath(path), None)
+        gc.collect()
+
+    def __enter__(self):
+        with self.lock:
+            self.depth += 1
+        return self
+
+    def __exit__(self, *args):
+        with self.lock:
+            self.depth -= 1
+            if not self.depth:
+                self.release()
+
+
+# the registry shared by all Optimus objects
+registry = ModelRegistry()
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
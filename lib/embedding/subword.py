@@ -0,0 +1,247 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import json
+import os
+
+# third party
+import fastText as ft
+import numpy as np
+
+
+# -- Definitions --------------------------------------------------------------
+# 32 bit FNV-1a constants, as used by the fastText dictionary
+FNV_OFFSET = np.uint32(2166136261)
+FNV_PRIME = np.uint32(16777619)
+
+
+def params_path(path):
+    """
+    Location of the json file holding the parameters and the vocabulary that
+    go with an exported input matrix
+    """
+    return os.path.splitext(path)[0] + '.json'
+
+
+def export_subwords(model, path):
+    """
+    Export a fastText model for use with the SubwordModel engine.
+
+    The input matrix (word rows followed by the hashed n-gram buckets) is
+    saved to the given .npy path. The n-gram parameters and the vocabulary
+    are saved next to it in a .json file of the same name.
+
+    Parameters
+    ----------
+    model : str / fastText model
+        a path to a .bin model or a loaded fastText model
+
+    path : str
+        the .npy path to export the input matrix to
+
+    Returns
+    -------
+    None
+
+    """
+    if isinstance(model, str):
+        model = ft.load_model(model)
+
+    args = model.f.getArgs()
+
+    np.save(path, model.get_input_matrix())
+
+    with open(params_path(path), 'w') as f:
+        json.dump({'minn': args.minn,
+                   'maxn': args.maxn,
+                   'bucket': args.bucket,
+                   'words': list(model.get_words())},
+                  f)
+
+
+class SubwordModel:
+    """
+    A pure NumPy reimplementation of the fastText word vector lookup.
+
+    Works from a model exported with export_subwords. The n-gram hashes of a
+    whole batch of strings are computed with array operations and their
+    rows are gathered from the memory-mapped input matrix, so only the rows
+    that are used are ever read from disk. The vectors are summed in the
+    same order and precision as fastText, which makes them match
+    get_word_vector of the original model.
+
+    It can be used anywhere a loaded fastText model is expected.
+    """
+
+    def __init__(self, path, mmap=True):
+        """
+        Constructor for the SubwordModel object.
+
+        Parameters
+        ----------
+        path : str
+            the .npy file written by export_subwords
+
+        mmap : bool
+            if true the input matrix is memory-mapped rather than read into
+            memory
+            (default=True)
+
+        Returns
+        -------
+        SubwordModel object
+
+        """
+        with open(params_path(path)) as f:
+            params = json.load(f)
+
+        self.matrix = np.load(path, mmap_mode='r' if mmap else None)
+        self.minn = params['minn']
+        self.maxn = params['maxn']
+        self.bucket = params['bucket']
+        self.vocab = {w: i for i, w in enumerate(params['words'])}
+        self.nwords = len(self.vocab)
+
+    def get_dimension(self):
+        """
+        The dimension of the vectors
+        """
+        return self.matrix.shape[1]
+
+    def get_word_vector(self, word):
+        """
+        Embed a single string, see get_word_vectors
+        """
+        return self.get_word_vectors([word])[0]
+
+    def subwords(self, words):
+        """
+        Find the input matrix rows that make up the vector of each string.
+
+        Follows Dictionary::computeSubwords of fastText: the string is
+        wrapped in '<' and '>', every run of minn to maxn utf-8 characters is
+        hashed with FNV-1a (xoring sign extended bytes) into one of the
+        buckets, and strings found in the vocabulary also use their own row.
+
+        Parameters
+        ----------
+        words : [str]
+            the strings to look up
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray)
+            the position in words each row belongs to and the row ids,
+            sorted by position and in the order fastText sums them
+
+        """
+        encoded = [('<' + w + '>').encode('utf-8') for w in words]
+        lengths = np.array([len(e) for e in encoded], dtype=np.int64)
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        # fastText xors each char as int8, so bytes above 127 sign extend
+        signed = data.view(np.int8).astype(np.uint32)
+
+        # byte offsets of the utf-8 characters and the string they belong to
+        starts = np.flatnonzero((data & 0xC0) != 0x80)
+        ends = np.append(starts[1:], len(data))
+        owner = np.repeat(np.arange(len(words)), lengths)[starts]
+
+        first = np.searchsorted(starts, np.cumsum(lengths) - lengths)
+        last = np.append(first[1:], len(starts)) - 1
+
+        # rows of the words found in the vocabulary come first
+        found = [(i, self.vocab[w])
+                 for i, w in enumerate(words) if w in self.vocab]
+        rows_owner = [np.array([i for i, _ in found], dtype=np.int64)]
+        rows_start = [np.full(len(found), -1, dtype=np.int64)]
+        rows_n = [np.zeros(len(found), dtype=np.int64)]
+        rows_id = [np.array([r for _, r in found], dtype=np.int64)]
+
+        # every character starts an n-gram, grown one character at a time
+        start = np.arange(len(starts))
+        h = np.full(len(starts), FNV_OFFSET, dtype=np.uint32)
+
+        maxn = self.maxn if self.bucket else 0
+
+        for n in range(1, maxn + 1):
+            cur = start + n - 1
+            live = cur <= last[owner[start]]
+            start, cur, h = start[live], cur[live], h[live]
+
+            if not len(start):
+                break
+
+            width = ends[cur] - starts[cur]
+            for k in range(int(width.max())):
+                m = k < width
+                h[m] = (h[m] ^ signed[starts[cur[m]] + k]) * FNV_PRIME
+
+            if n >= self.minn:
+                o = owner[start]
+                keep = ((n != 1)
+                        | ((start != first[o]) & (cur != last[o])))
+                rows_owner.append(o[keep])
+                rows_start.append(start[keep])
+                rows_n.append(np.full(keep.sum(), n, dtype=np.int64))
+                rows_id.append(
+                    (h[keep] % np.uint32(self.bucket)).astype(np.int64)
+                    + self.nwords)
+
+        rows_owner = np.concatenate(rows_owner)
+        rows_id = np.concatenate(rows_id)
+        order = np.lexsort((np.concatenate(rows_n),
+                            np.concatenate(rows_start),
+                            rows_owner))
+
+        return rows_owner[order], rows_id[order]
+
+    def get_word_vectors(self, words):
+        """
+        Embed a batch of strings.
+
+        Parameters
+        ----------
+        words : [str]
+            the strings to embed
+
+        Returns
+        -------
+        numpy.ndarray
+            a float32 matrix of shape (len(words), dim)
+
+        """
+        vectors = np.zeros((len(words), self.get_dimension()),
+                           dtype=np.float32)
+        owner, ids = self.subwords(words)
+
+        if not len(ids):
+            return vectors
+
+        # sorting the ids keeps the reads on the memory map sequential
+        order = np.argsort(ids, kind='stable')
+        rows = np.empty((len(ids), self.get_dimension()), dtype=np.float32)
+        rows[order] = self.matrix[ids[order]]
+
+        # strings with the most rows first, so that the k-th row of every
+        # string that has one is a prefix of the batch
+        counts = np.bincount(owner, minlength=len(words))
+        used = np.argsort(-counts, kind='stable')[:np.count_nonzero(counts)]
+        offsets = np.searchsorted(owner, used)
+        depth = np.searchsorted(-counts[used], -np.arange(counts.max()))
+
+        # summing row by row in float32 and scaling by float(1 / count)
+        # reproduces the arithmetic of fastText exactly
+        total = np.zeros((len(used), self.get_dimension()), dtype=np.float32)
+        for k, size in enumerate(depth):
+            total[:size] += rows[offsets[:size] + k]
+
+        scale = (1.0 / counts[used]).astype(np.float32)[:, None]
+        vectors[used] = total * scale
+
+        return vectors
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
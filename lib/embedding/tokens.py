@@ -0,0 +1,82 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+import scipy.sparse as sp
+
+# project
+from .embed import embed
+
+
+# -- Definitions --------------------------------------------------------------
+def embed_tokens(words, model, cache=None, idf=False, **kwargs):
+    """
+    Embed each string as the mean of the vectors of its tokens.
+
+    The strings are split into tokens once and every distinct token is
+    embedded once, so strings that share tokens share the work. The string
+    vectors are then the rows of a sparse (strings x tokens) weight matrix
+    multiplied by the dense token matrix.
+
+    Parameters
+    ----------
+    words : [str]
+        a list of strings to embed
+
+    model : fastText model
+        a loaded model, or any backend, used to embed the tokens
+
+    cache : EmbeddingCache / MemoryCache
+        an optional cache of token vectors, checked before the model is
+        called
+        (default=None)
+
+    idf : bool
+        if true weight each token by its smoothed inverse document frequency
+        across the strings, rather than taking a plain mean
+        (default=False)
+
+    kwargs
+        passed on to embed, see embed for the workers, batch and pool
+        settings
+
+    Returns
+    -------
+    numpy.ndarray
+        a float32 matrix of shape (len(words), model.get_dimension()), rows
+        of strings without any tokens are zero
+
+    """
+    vocab = {}
+    indices = []
+    indptr = [0]
+
+    for word in words:
+        indices.extend(vocab.setdefault(t, len(vocab)) for t in word.split())
+        indptr.append(len(indices))
+
+    print(f"    ** {len(vocab)} distinct tokens in {len(words)} strings")
+    tokens = embed(list(vocab), model, cache=cache, **kwargs)
+
+    # repeated tokens within a string are summed into their count
+    weights = sp.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr),
+        shape=(len(words), len(vocab)))
+    weights.sum_duplicates()
+
+    if idf:
+        df = np.bincount(weights.indices, minlength=len(vocab))
+        weights = weights @ sp.diags(
+            (np.log((1 + len(words)) / (1 + df)) + 1).astype(np.float32))
+
+    totals = np.asarray(weights.sum(axis=1)).ravel()
+    scale = np.divide(1, totals, out=np.zeros_like(totals), where=totals > 0)
+    weights = sp.diags(scale.astype(np.float32)) @ weights
+
+    return np.ascontiguousarray(weights @ tokens, dtype=np.float32)
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
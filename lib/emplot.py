@@ -1,11 +1,11 @@
 import re
-import fastText as ft
 import pandas as pd
 import json
 from sklearn.manifold import TSNE
 from bokeh.plotting import figure, save, output_file
 from bokeh.models import ColumnDataSource, LabelSet
 
+from lib.embedding import embed, load_model
 
 
 def default_cleaner(word):
@@ -38,7 +38,7 @@ def default_cleaner(word):
     return w
 
 
-def embed_words(words, model, cleaner, output_path):
+def embed_words(words, model, cleaner, output_path, workers=1):
     """
     The function that embeds plots using the fastText model.
 
@@ -47,7 +47,7 @@ def embed_words(words, model, cleaner, output_path):
     words : iter
         some form of iterable containing strings
     model : str | fastText.model
-        a string to the model or a fastText model
+        a path to a model file (any supported backend) or a loaded model
     cleaner : func
         a function to use to clean the strings.
         It should take in: word :: str -> str
@@ -55,6 +55,9 @@ def embed_words(words, model, cleaner, output_path):
         if provided, this path will dictate where
         the embedded vectors will be saved (useful if
         the embeddings is all that is needed)
+    workers : int
+        the number of threads used to embed the strings
+        (default=1)
 
     Returns
     -------
@@ -66,10 +69,14 @@ def embed_words(words, model, cleaner, output_path):
     """
 
     if type(model) == str:
-        model = ft.load_model(model)
+        model = load_model(model)
 
-    vectors = [model.get_word_vector(cleaner(word)) for word in words]
-    output = pd.DataFrame([(w, *v) for w, v in zip(words, vectors)])
+    words = list(words)
+    vectors = embed([cleaner(word) for word in words], model, workers=workers)
+
+    # strings in the first column, followed by one column per dimension
+    output = pd.DataFrame(vectors, columns=range(1, vectors.shape[1] + 1))
+    output.insert(0, 0, words)
 
     if output_path:
         output.to_csv(output_path)
@@ -168,7 +175,7 @@ def plot(series, model, output_path='', cleaner=default_cleaner):
         a pandas series with the strings that you want to
         embed.
     model : str | fastText model
-        a string or loaded fastText model to use for embeddings
+        a path to a model file or a loaded model to use for embeddings
     output_path : str
         if provided, this path will be used to save a csv
         containing the original (cleaned) strings and
@@ -2,3 +2,4 @@ from .hypernyms import Hypernyms
 from .levenshtein import EditDistance
 from .wordngram import WordGram
 from .charactergram import CharGram
+from .cache import DistanceCache, TokenCache
@@ -0,0 +1,256 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import itertools
+import re
+
+# third party
+from nltk import pos_tag_sents
+from nltk.tokenize import word_tokenize
+
+
+# -- Definitions --------------------------------------------------------------
+class DistanceCache:
+    """
+    An in memory store of the edit distances computed during a run.
+
+    Each distinct string is interned to an integer id the first time it is
+    seen, and a distance is kept under the unordered pair of ids together
+    with whether transpositions were counted. The labellers ask for the same
+    pairs within a tier, as the clusters rejected by one are measured again
+    by the next, and in later tiers as the clusters grow. Once the store
+    holds more than size distances the least recently used are dropped.
+    """
+
+    def __init__(self, size=1000000):
+        """
+        Constructor for the DistanceCache object.
+
+        Parameters
+        ----------
+        size : int
+            the maximum number of distances kept
+            (default=1000000)
+
+        Returns
+        -------
+        DistanceCache object
+
+        """
+        self.size = size
+
+        # string -> id, and (pair key -> distance) in order of last use
+        self.ids = {}
+        self.distances = {}
+
+        # keep track of how useful the cache has been during this run
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def rate(self):
+        """
+        The fraction of the distances asked for that were found
+        """
+        asked = self.hits + self.misses
+        return self.hits / asked if asked else 0.0
+
+    def key(self, a, b, transpositions):
+        """
+        The key of a pair of strings, the same whichever way round they are
+        """
+        i = self.ids.setdefault(a, len(self.ids))
+        j = self.ids.setdefault(b, len(self.ids))
+        if i > j:
+            i, j = j, i
+
+        return ((i << 32 | j) << 1) | bool(transpositions)
+
+    def get(self, a, b, transpositions, out):
+        """
+        Fill out with the distances of the pairs that are already cached and
+        return the positions of those that are not
+
+        Parameters
+        ----------
+        a, b : [str]
+            the strings of each pair
+
+        transpositions : bool
+            whether the distances count swaps as a single edit
+
+        out : numpy.ndarray
+            an array of len(a) to write the distances into
+
+        Returns
+        -------
+        list
+            the positions of the pairs that were not found in the cache
+
+        """
+        missing = []
+
+        for k, (x, y) in enumerate(zip(a, b)):
+            key = self.key(x, y, transpositions)
+            distance = self.distances.pop(key, None)
+            if distance is None:
+                missing.append(k)
+            else:
+                # put back at the end, as the most recently used
+                self.distances[key] = distance
+                out[k] = distance
+
+        self.hits += len(a) - len(missing)
+        self.misses += len(missing)
+
+        return missing
+
+    def update(self, a, b, transpositions, distances):
+        """
+        Add newly computed distances to the cache, dropping the least
+        recently used beyond the size cap
+
+        Parameters
+        ----------
+        a, b : [str]
+            the strings of each pair
+
+        transpositions : bool
+            whether the distances count swaps as a single edit
+
+        distances : numpy.ndarray
+            the distance of each pair
+
+        """
+        for x, y, distance in zip(a, b, distances):
+            self.distances[self.key(x, y, transpositions)] = int(distance)
+
+        excess = len(self.distances) - self.size
+        if excess > 0:
+            for key in list(itertools.islice(self.distances, excess)):
+                del self.distances[key]
+
+
+class TokenCache:
+    """
+    An in memory store of the tokens and part of speech tags of the strings
+    seen during a run.
+
+    Each distinct string is interned to an integer id the first time it is
+    seen, and is tokenised and tagged at most once, however many labellers
+    and tiers ask for it. The lists handed out are shared and must not be
+    changed.
+    """
+
+    # strings of words, whitespace and hyphens, bar those the nltk
+    # tokeniser splits up, are tokenised by it exactly as by str.split
+    plain = re.compile(r"[\w\s-]*")
+    joined = re.compile(r"(?i)\b(cannot|gimme|gonna|gotta|lemme|wanna)\b|--")
+
+    def __init__(self, tokeniser='nltk'):
+        """
+        Constructor for the TokenCache object.
+
+        Parameters
+        ----------
+        tokeniser : str
+            "nltk" to tokenise with nltk.word_tokenize, or "regex" to split
+            the strings the nltk tokeniser would split on whitespace alone
+            without it, and only fall back to it for the others
+            (default="nltk")
+
+        Returns
+        -------
+        TokenCache object
+
+        """
+        self.tokeniser = tokeniser
+
+        # string -> id, and the tokens and tags by id, None until asked for
+        self.ids = {}
+        self.words = []
+        self.tags = []
+
+        # keep track of how useful the cache has been during this run
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, string):
+        """
+        The id of a string, given a new one the first time it is seen
+        """
+        i = self.ids.get(string)
+        if i is None:
+            i = self.ids[string] = len(self.ids)
+            self.words.append(None)
+            self.tags.append(None)
+
+        return i
+
+    def tokenise(self, string):
+        """
+        Tokenise a string with the configured tokeniser
+        """
+        if self.tokeniser == 'regex' and self.plain.fullmatch(string) \
+                and not self.joined.search(string):
+            return string.split()
+
+        return word_tokenize(string)
+
+    def tokens(self, string):
+        """
+        The tokens of a string, as nltk.word_tokenize gives them
+
+        Parameters
+        ----------
+        string : str
+            the string to tokenise
+
+        Returns
+        -------
+        [str]
+
+        """
+        i = self.intern(string)
+        if self.words[i] is None:
+            self.words[i] = self.tokenise(string)
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return self.words[i]
+
+    def tagged(self, strings):
+        """
+        The part of speech tags of the whitespace separated words of each
+        string, tagging all the new strings together
+
+        Parameters
+        ----------
+        strings : [str]
+            the strings to tag
+
+        Returns
+        -------
+        [[(str, str)]]
+            the (word, tag) pairs of each string
+
+        """
+        ids = [self.intern(string) for string in strings]
+
+        new = list(dict.fromkeys(i for i in ids if self.tags[i] is None))
+        if new:
+            words = {i: string.split() for i, string in zip(ids, strings)}
+            for i, tags in zip(new, pos_tag_sents([words[i] for i in new])):
+                self.tags[i] = tags
+
+        self.misses += len(new)
+        self.hits += len(ids) - len(new)
+
+        return [self.tags[i] for i in ids]
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
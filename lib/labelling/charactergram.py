@@ -1,14 +1,15 @@
 # -- Imports ------------------------------------------------------------------
 
 # base
-import itertools
 import math
 
 # third party
 import numpy as np
 import pandas as pd
 
-from nltk.metrics.distance import edit_distance
+# project
+from .distance import mean_distances, sampled_means
+from .suffix import best_substring
 
 
 # -- Definitions --------------------------------------------------------------
@@ -19,7 +20,7 @@ class CharGram:
     and checking they have common character n-grams
     """
 
-    def __init__(self, clusterconstructor, config):
+    def __init__(self, clusterconstructor, config, cache=None):
         """
         Constructor for the CharGram object.
         Part of the auto-generation of labels for clusters
@@ -34,6 +35,10 @@ class CharGram:
             that will be labeled.
         config : dict
             a dictionary of configs
+        cache : DistanceCache
+            an optional store of the edit distances computed during the
+            run, shared with the other labellers
+            (default=None)
 
         Returns
         -------
@@ -44,12 +49,27 @@ class CharGram:
         # objects
         self.threshold = config['ng_threshold']
         self.clusters = clusterconstructor.clusters
+        self.config = config
+        self.cache = cache
+
+        # how often each string occurs, when that should count
+        self.counts = clusterconstructor.counts \
+            if config['frequency_weights'] else {}
+
+        # the batch and suffix engines find the best n-gram of each cluster
+        # without keeping the n-grams and score tables of each cluster
+        if config['ng_engine'] == 'batch':
+            ngrams = self.batch_ngrams
+        elif config['ng_engine'] == 'suffix':
+            ngrams = self.suffix_ngrams
+        else:
+            ngrams = self.get_ngrams
 
         (self.n_grams,
          self.ng_all_scores,
          self.ng_lookup,
          self.accepted,
-         self.rejected) = self.get_ngrams()
+         self.rejected) = ngrams()
 
         self.label = self.ng_labels()
 
@@ -91,7 +111,7 @@ class CharGram:
 
         return all_ngrams
 
-    def count_ngrams(self, ngram_list):
+    def count_ngrams(self, ngram_list, weights=None):
         """
         For a list of character ngrams - returns table of scores.
 
@@ -99,6 +119,8 @@ class CharGram:
         ----------
         ngram_list : [str]
             a list of strings to perform the operation on
+        weights : [num]
+            how much each ngram counts for, one each if not given
 
         Returns
         -------
@@ -106,13 +128,16 @@ class CharGram:
             score table
 
         """
+        if weights is None:
+            weights = [1] * len(ngram_list)
+
         # lets count the occurance of a specific word gram across the cluster
         ngrams = {}
-        for ngram in ngram_list:
+        for ngram, weight in zip(ngram_list, weights):
             if ngram in ngrams:
-                ngrams[ngram] += 1
+                ngrams[ngram] += weight
             else:
-                ngrams[ngram] = 1
+                ngrams[ngram] = weight
 
         # create a data frame for a lcuster of items
         # ngram | count | length | score (count*length)
@@ -122,11 +147,68 @@ class CharGram:
             lambda row: len(row.ngram), axis=1)
         ngram_count_list['score'] = ngram_count_list.apply(
             lambda row: row.no * row.no * (1 + math.log(row.length)), axis=1)
+        # a stable sort leaves tied ngrams in the order they were first seen
         ngram_count_list = ngram_count_list.sort_values(
-            "score", ascending=False)
+            "score", ascending=False, kind='stable')
 
         return ngram_count_list
 
+    def mean_distances(self):
+        """
+        The mean distances of all the clusters, computed in one go, apart
+        from the large ones which are estimated from a sample of pairs
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray)
+            the mean of each cluster and its margin of error, 0 when it was
+            computed exactly
+
+        """
+        means, margins = sampled_means(
+            self.clusters,
+            self.config['lad_sample_above'],
+            pairs=self.config['lad_sample_pairs'],
+            confidence=self.config['lad_confidence'],
+            cache=self.cache)
+        exact = np.isnan(means)
+        means[exact] = mean_distances(
+            [c for c, e in zip(self.clusters, exact) if e],
+            cache=self.cache)
+
+        return means, margins
+
+    def accepts(self, cluster, score, lv, margin):
+        """
+        Whether the best n-gram of a cluster scores high enough for it to be
+        the label
+
+        Parameters
+        ----------
+        cluster : [str]
+            the items of the cluster
+        score : float
+            the score of its best n-gram
+        lv : float
+            the mean distance between its items
+        margin : float
+            the margin of error of lv, 0 if it is exact
+
+        Returns
+        -------
+        bool
+
+        """
+        size = sum(self.counts.get(item, 1) for item in cluster)
+
+        # the mean distance below which the cluster is accepted, an estimate
+        # too close to it is replaced by the exact mean
+        if margin and abs(lv - score / (self.threshold * math.log(size))) \
+                <= margin:
+            lv = mean_distances([cluster], cache=self.cache)[0]
+
+        return score / (lv * math.log(size)) > self.threshold
+
     def get_ngrams(self):
         """
         Scores each cluster and handles the output of qualifying ngram labels
@@ -140,12 +222,12 @@ class CharGram:
         accepted = []
         rejected = []
 
+        means, margins = self.mean_distances()
+
         # for each cluster of items
-        for cluster in self.clusters:
+        for cluster, lv, margin in zip(self.clusters, means, margins):
             # check that a cluster has at least 2 items - should always be the
             # case
-
-            lv = self.lad(cluster)
             if len(cluster) < 2:
                 items.append("NONE")
                 ngrams.append("NONE")
@@ -155,7 +237,12 @@ class CharGram:
                 rejected.append(cluster)
 
             else:
-                n = self.characters(cluster)
+                # the ngrams of each item count as often as the item occurs
+                grams = [self.characters([item]) for item in cluster]
+                n = [gram for item in grams for gram in item]
+                weights = [self.counts.get(word, 1)
+                           for word, item in zip(cluster, grams)
+                           for _ in item]
                 # if there are no n-grams that qualify (3gram - 20gram in our
                 # code above) then dont propose a label
                 if not n:
@@ -166,10 +253,12 @@ class CharGram:
                     items.append(cluster)
                     ngrams.append(n)
 
-                    ngram_measures.append(self.count_ngrams(ngrams[-1]))
+                    ngram_measures.append(
+                        self.count_ngrams(ngrams[-1], weights))
+
+                    score = ngram_measures[-1].iloc[0, 3]
 
-                    if ngram_measures[-1].iloc[0, 3] \
-                       / (lv * math.log(len(cluster))) > self.threshold:
+                    if self.accepts(cluster, score, lv, margin):
                         accepted.append(cluster)
                         links[tuple(cluster)] = ngram_measures[-1].iloc[0, 0]
                     else:
@@ -177,6 +266,118 @@ class CharGram:
 
         return ngrams, ngram_measures, links, accepted, rejected
 
+    def batch_ngrams(self):
+        """
+        Scores the n-grams of every cluster together and handles the output
+        of qualifying ngram labels, as get_ngrams does
+
+        The n-grams of all the clusters are counted into the non zero
+        entries of a single sparse cluster x n-gram matrix, which is scored
+        and reduced to the best n-gram of each cluster with a handful of
+        array operations. Ties go to the n-gram seen first in the cluster,
+        as they do in count_ngrams, so the labels are those of get_ngrams.
+        The per cluster n-gram lists and score tables are not kept.
+
+        """
+        # the n-grams of every item, each counting as often as the item
+        # occurs, as (cluster, n-gram, weight) entries
+        vocab = {}
+        rows = []
+        cols = []
+        data = []
+        for k, cluster in enumerate(self.clusters):
+            if len(cluster) < 2:
+                continue
+            for item in cluster:
+                grams = self.characters([item])
+                cols.extend(vocab.setdefault(g, len(vocab)) for g in grams)
+                rows.extend([k] * len(grams))
+                data.extend([self.counts.get(item, 1)] * len(grams))
+
+        # sum the duplicate entries, remembering where each was first seen
+        width = max(len(vocab), 1)
+        keys = np.asarray(rows, dtype=np.int64) * width \
+            + np.asarray(cols, dtype=np.int64)
+        keys, first, inverse = np.unique(keys,
+                                         return_index=True,
+                                         return_inverse=True)
+        no = np.bincount(inverse, weights=data, minlength=len(keys))
+        row, col = np.divmod(keys, width)
+
+        # score = count^2 * (1 + log(length)), the best of each cluster, with
+        # the log of math as count_ngrams has it, numpy's may differ in the
+        # last bit
+        lengths = np.array([1 + math.log(len(g)) for g in vocab])
+        scores = no * no * lengths[col]
+        order = np.lexsort((first, -scores, row))
+        top = order[np.searchsorted(row[order], np.unique(row))]
+        grams = list(vocab)
+
+        return self.best_labels({
+            k: (grams[c], score)
+            for k, c, score in zip(row[top].tolist(),
+                                   col[top].tolist(),
+                                   scores[top].tolist())
+        })
+
+    def suffix_ngrams(self):
+        """
+        Finds the best n-gram of each cluster with a suffix automaton and
+        handles the output of qualifying ngram labels, as get_ngrams does
+
+        The automaton of a cluster takes time and memory linear in the
+        total length of its items, however long they are, and gives the
+        same label and score as count_ngrams, ties included. The per cluster
+        n-gram lists and score tables are not kept.
+
+        """
+        best = {}
+        for k, cluster in enumerate(self.clusters):
+            if len(cluster) < 2:
+                continue
+            found = best_substring(
+                cluster, [self.counts.get(item, 1) for item in cluster])
+            if found is not None:
+                best[k] = found[0], found[2]
+
+        return self.best_labels(best)
+
+    def best_labels(self, best):
+        """
+        Handles the output of qualifying ngram labels given the best n-gram
+        of each cluster
+
+        Parameters
+        ----------
+        best : dict
+            the (n-gram, score) of each cluster by its position, clusters
+            without a qualifying n-gram are left out
+
+        Returns
+        -------
+        ([], [], dict, list, list)
+            the output of get_ngrams, without the n-grams and score tables
+
+        """
+        links = {}
+        accepted = []
+        rejected = []
+
+        means, margins = self.mean_distances()
+
+        for k, (cluster, lv, margin) in enumerate(
+                zip(self.clusters, means, margins)):
+            if k not in best:
+                links[tuple(cluster)] = ('None',)
+                rejected.append(cluster)
+            elif self.accepts(cluster, best[k][1], lv, margin):
+                accepted.append(cluster)
+                links[tuple(cluster)] = best[k][0]
+            else:
+                rejected.append(cluster)
+
+        return [], [], links, accepted, rejected
+
     def ng_labels(self):
         """
         Function to return a processed label (not tuples)
@@ -201,12 +402,7 @@ class CharGram:
 
         """
 
-        if len(a) == 1:
-            return 0
-        else:
-            dists = [edit_distance(i, j)
-                     for i, j in itertools.combinations(a, 2)]
-            return np.mean(dists)
+        return mean_distances([a], cache=self.cache)[0]
 
 
 # -- Boilerplate --------------------------------------------------------------
@@ -0,0 +1,589 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import itertools
+
+# third party
+import numpy as np
+import scipy.sparse as sp
+from scipy.stats import norm
+
+
+# -- Definitions --------------------------------------------------------------
+def encode(strings):
+    """
+    Turn strings into a padded matrix of code points
+
+    Parameters
+    ----------
+    strings : [str]
+        the strings to encode
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        a (len(strings), longest) matrix padded with -1 and the length of
+        each string
+
+    """
+    lengths = np.array([len(s) for s in strings], dtype=np.int64)
+    codes = np.full((len(strings), max(lengths.max(initial=0), 1)), -1,
+                    dtype=np.int64)
+
+    for row, s in enumerate(strings):
+        codes[row, :len(s)] = [ord(c) for c in s]
+
+    return codes, lengths
+
+
+def batch_distances(a, la, b, lb, transpositions=False):
+    """
+    Edit distances between the rows of two code point matrices, pair by pair
+
+    The dynamic programming table of every pair is filled in at once, one
+    anti-diagonal at a time, as each cell only depends on cells of earlier
+    anti-diagonals. With transpositions the last matching positions used by
+    the Damerau-Levenshtein recurrence of nltk are found with running
+    maxima over the table of character matches.
+
+    Parameters
+    ----------
+    a, b : numpy.ndarray
+        (pairs, length) code point matrices, see encode
+
+    la, lb : numpy.ndarray
+        the length of each string
+
+    transpositions : bool
+        whether swapping two characters counts as a single edit
+        (default=False)
+
+    Returns
+    -------
+    numpy.ndarray
+        the distance of each pair
+
+    """
+    pairs = len(a)
+    n, m = int(la.max()), int(lb.max())
+    a, b = a[:, :n], b[:, :m]
+
+    # padding never matches, as the two sides are padded differently
+    eq = (a[:, :, None] == b[:, None, :]) \
+        & (a[:, :, None] >= 0) & (b[:, None, :] >= 0)
+
+    D = np.zeros((pairs, n + 1, m + 1), dtype=np.int32)
+    D[:, :, 0] = np.arange(n + 1)
+    D[:, 0, :] = np.arange(m + 1)
+
+    if transpositions:
+        # the last row above i holding the character of column j, and the
+        # last column left of j holding the character of row i, 1-based
+        rows = np.where(eq, np.arange(1, n + 1)[None, :, None], 0)
+        left = np.zeros((pairs, n + 1, m + 1), dtype=np.int32)
+        left[:, 2:, 1:] = np.maximum.accumulate(rows, axis=1)[:, :-1]
+        cols = np.where(eq, np.arange(1, m + 1)[None, None, :], 0)
+        right = np.zeros((pairs, n + 1, m + 1), dtype=np.int32)
+        right[:, 1:, 2:] = np.maximum.accumulate(cols, axis=2)[:, :, :-1]
+
+    index = np.arange(pairs)[:, None]
+    for d in range(2, n + m + 1):
+        i = np.arange(max(1, d - m), min(n, d - 1) + 1)
+        j = d - i
+
+        best = np.minimum(D[:, i - 1, j] + 1, D[:, i, j - 1] + 1)
+        best = np.minimum(best, D[:, i - 1, j - 1] + ~eq[:, i - 1, j - 1])
+
+        if transpositions:
+            x, y = left[:, i, j], right[:, i, j]
+            swap = D[index, np.maximum(x - 1, 0), np.maximum(y - 1, 0)] \
+                + (i - x) + (j - y) - 1
+            best = np.where((x > 0) & (y > 0),
+                            np.minimum(best, swap),
+                            best)
+
+        D[:, i, j] = best
+
+    return D[np.arange(pairs), la, lb]
+
+
+def batches(cost, budget):
+    """
+    Split items sorted by increasing cost into runs in which the number of
+    items times the cost of the largest stays within a budget
+
+    Parameters
+    ----------
+    cost : numpy.ndarray
+        the cost of each item, in increasing order
+
+    budget : int
+        the most a run may cost, a single item costing more gets a run of
+        its own
+
+    Returns
+    -------
+    [(int, int)]
+        the start and end of each run
+
+    """
+    runs = []
+    start = 0
+    while start < len(cost):
+        end = min(len(cost), start + max(1, budget // cost[start]))
+        # shrink the run until its largest item fits
+        while end - start > 1 and (end - start) * cost[end - 1] > budget:
+            end = start + max(1, budget // cost[end - 1])
+        runs.append((start, end))
+        start = end
+
+    return runs
+
+
+def edit_distances(a, b, transpositions=False, cells=2**22, cache=None):
+    """
+    Edit distances of many pairs of strings, computed in batches of
+    similar length
+
+    Gives the same distances as nltk.metrics.distance.edit_distance.
+
+    Parameters
+    ----------
+    a, b : [str]
+        the strings of each pair, a[k] is compared with b[k]
+
+    transpositions : bool
+        whether swapping two characters counts as a single edit
+        (default=False)
+
+    cells : int
+        the most cells of the dynamic programming tables filled in together,
+        which bounds the memory used whatever the length of the strings
+        (default=4194304)
+
+    cache : DistanceCache
+        an optional store of distances computed before, only the pairs it
+        does not hold are computed and they are added to it
+        (default=None)
+
+    Returns
+    -------
+    numpy.ndarray
+        the distance of each pair
+
+    """
+    distances = np.zeros(len(a), dtype=np.int64)
+    if not len(a):
+        return distances
+
+    if cache is not None:
+        missing = cache.get(a, b, transpositions, distances)
+        if missing:
+            a = [a[k] for k in missing]
+            b = [b[k] for k in missing]
+            distances[missing] = edit_distances(a, b, transpositions, cells)
+            cache.update(a, b, transpositions, distances[missing])
+        return distances
+
+    # encode every distinct string once
+    strings = {}
+    ia = np.array([strings.setdefault(s, len(strings)) for s in a])
+    ib = np.array([strings.setdefault(s, len(strings)) for s in b])
+    codes, lengths = encode(list(strings))
+
+    # batch pairs of similar size together to keep the padding small, and
+    # size the batches by the tables they fill in
+    longest = np.maximum(lengths[ia], lengths[ib])
+    order = np.lexsort((np.minimum(lengths[ia], lengths[ib]), longest))
+
+    for start, end in batches((longest[order] + 1) ** 2, cells):
+        k = order[start:end]
+        n = max(lengths[ia[k]].max(), 1)
+        m = max(lengths[ib[k]].max(), 1)
+        distances[k] = batch_distances(codes[ia[k], :n], lengths[ia[k]],
+                                       codes[ib[k], :m], lengths[ib[k]],
+                                       transpositions)
+
+    return distances
+
+
+def pairs_of(clusters):
+    """
+    Every pair of items within each cluster
+
+    Parameters
+    ----------
+    clusters : [[str]]
+        the clusters to take the pairs of
+
+    Returns
+    -------
+    ([str], [str], numpy.ndarray)
+        the two sides of each pair and the cluster it belongs to
+
+    """
+    a, b, owner = [], [], []
+    for k, cluster in enumerate(clusters):
+        for x, y in itertools.combinations(cluster, 2):
+            a.append(x)
+            b.append(y)
+            owner.append(k)
+
+    return a, b, np.array(owner, dtype=np.int64)
+
+
+def mean_distances(clusters, transpositions=False, cache=None):
+    """
+    The mean edit distance between every pair of items of each cluster, with
+    the pairs of all the clusters computed together
+
+    Parameters
+    ----------
+    clusters : [[str]]
+        the clusters to measure
+
+    transpositions : bool
+        whether swapping two characters counts as a single edit
+        (default=False)
+
+    cache : DistanceCache
+        an optional store of distances computed before, see edit_distances
+        (default=None)
+
+    Returns
+    -------
+    numpy.ndarray
+        the mean distance of each cluster, 0 for clusters of a single item
+
+    """
+    a, b, owner = pairs_of(clusters)
+
+    totals = np.bincount(owner,
+                         weights=edit_distances(a, b, transpositions,
+                                                cache=cache),
+                         minlength=len(clusters))
+    pairs = np.bincount(owner, minlength=len(clusters))
+
+    return np.divide(totals, pairs, out=np.zeros(len(clusters)),
+                     where=pairs > 0)
+
+
+def profiles(strings, q):
+    """
+    Count the q-grams of each string
+
+    Parameters
+    ----------
+    strings : [str]
+        the strings to profile
+
+    q : int
+        the length of the grams
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        a (strings x q-grams) matrix of counts
+
+    """
+    vocab = {}
+    indices = []
+    indptr = [0]
+
+    for s in strings:
+        indices.extend(vocab.setdefault(s[i:i + q], len(vocab))
+                       for i in range(len(s) - q + 1))
+        indptr.append(len(indices))
+
+    counts = sp.csr_matrix(
+        (np.ones(len(indices), dtype=np.int64), indices, indptr),
+        shape=(len(strings), max(len(vocab), 1)))
+    counts.sum_duplicates()
+
+    return counts
+
+
+def bounds(a, b, q=2, cells=2**22):
+    """
+    Cheap lower and upper bounds on the edit distance of pairs of strings
+
+    An edit changes the count of at most one character on each side, and at
+    most q of the q-grams on each side, which bounds the distance from below
+    by the character and q-gram count differences. Editing everything
+    between the common prefix and suffix bounds it from above.
+
+    The pairs are bounded in chunks of similar length, each padded to its own
+    longest string, so a single long string does not pad every pair.
+
+    Parameters
+    ----------
+    a, b : [str]
+        the strings of each pair
+
+    q : int
+        the length of the grams of the q-gram filter
+        (default=2)
+
+    cells : int
+        the most code points of the pairs held at once, padding included
+        (default=4194304)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        the lower and upper bound of each pair
+
+    """
+    strings = {}
+    ia = np.array([strings.setdefault(s, len(strings)) for s in a])
+    ib = np.array([strings.setdefault(s, len(strings)) for s in b])
+    unique = list(strings)
+
+    chars = profiles(unique, 1)
+    grams = profiles(unique, q)
+    lengths = np.array([len(s) for s in unique], dtype=np.int64)
+
+    longest = np.maximum(lengths[ia], lengths[ib])
+    order = np.argsort(longest, kind='stable')
+
+    lower = np.zeros(len(a), dtype=np.int64)
+    upper = np.zeros(len(a), dtype=np.int64)
+
+    for start, end in batches(longest[order] + 1, cells):
+        k = order[start:end]
+        x, y = ia[k], ib[k]
+
+        diff = chars[x] - chars[y]
+        surplus = np.asarray(diff.maximum(0).sum(axis=1)).ravel()
+        deficit = np.asarray((-diff).maximum(0).sum(axis=1)).ravel()
+        spread = np.asarray(abs(grams[x] - grams[y]).sum(axis=1)).ravel()
+
+        lower[k] = np.maximum(np.maximum(surplus, deficit),
+                              -(-spread // (2 * q)))
+
+        # common prefixes and suffixes, from the code points read both ways,
+        # encoding the strings of the chunk once each
+        used, pair = np.unique(np.concatenate([x, y]), return_inverse=True)
+        x, y = pair[:len(k)], pair[len(k):]
+        codes, length = encode([unique[i] for i in used])
+        backwards, _ = encode([unique[i][::-1] for i in used])
+        la, lb = length[x], length[y]
+        shortest = np.minimum(la, lb)
+
+        prefix = np.cumprod(codes[x] == codes[y], axis=1).sum(axis=1)
+        prefix = np.minimum(prefix, shortest)
+        suffix = np.cumprod(backwards[x] == backwards[y], axis=1).sum(axis=1)
+        suffix = np.minimum(suffix, shortest - prefix)
+
+        upper[k] = np.maximum(la, lb) - prefix - suffix
+
+    return lower, upper
+
+
+def accept_mean(clusters, threshold, chunk=64, q=2, cache=None):
+    """
+    Decide for each cluster whether the mean edit distance between its items
+    is at most threshold, computing as few distances as possible
+
+    The sums of the lower and upper bounds of the pairs of a cluster bound
+    the sum of its distances. A cluster is decided as soon as the upper sum
+    is within threshold times the number of pairs, or the lower sum is
+    beyond it. Until then the loosest pairs of every undecided cluster are
+    computed exactly, chunk pairs at a time and in a single batch across
+    clusters, replacing their bounds.
+
+    Parameters
+    ----------
+    clusters : [[str]]
+        the clusters to decide on
+
+    threshold : float
+        the largest mean distance accepted
+
+    chunk : int
+        the number of pairs of each cluster computed per round
+        (default=64)
+
+    q : int
+        the length of the grams of the q-gram filter
+        (default=2)
+
+    cache : DistanceCache
+        an optional store of distances computed before, see edit_distances
+        (default=None)
+
+    Returns
+    -------
+    (numpy.ndarray, int, int)
+        whether each cluster is accepted, the number of distances computed
+        exactly and the number of pairs
+
+    """
+    a, b, owner = pairs_of(clusters)
+    k = len(clusters)
+
+    budget = threshold * np.bincount(owner, minlength=k)
+    if not len(owner):
+        return budget >= 0, 0, 0
+
+    lower, upper = bounds(a, b, q)
+    low = np.bincount(owner, weights=lower, minlength=k)
+    high = np.bincount(owner, weights=upper, minlength=k)
+
+    # the loosest pairs of each cluster come first
+    order = np.lexsort((lower - upper, owner))
+    first = np.searchsorted(owner[order], owner[order])
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order)) - first
+
+    computed = 0
+    rounds = 0
+    while True:
+        open_ = (high > budget) & (low <= budget)
+        if not open_.any():
+            break
+
+        todo = np.flatnonzero(open_[owner]
+                              & (rank >= rounds * chunk)
+                              & (rank < (rounds + 1) * chunk)
+                              & (lower < upper))
+        rounds += 1
+        if not len(todo):
+            continue
+
+        exact = edit_distances([a[i] for i in todo],
+                               [b[i] for i in todo],
+                               cache=cache)
+        low += np.bincount(owner[todo], weights=exact - lower[todo],
+                           minlength=k)
+        high += np.bincount(owner[todo], weights=exact - upper[todo],
+                            minlength=k)
+        computed += len(todo)
+
+    return high <= budget, computed, len(owner)
+
+
+def estimate_means(clusters,
+                   pairs=2000,
+                   seed=0,
+                   transpositions=False,
+                   cache=None):
+    """
+    Estimate the mean edit distance between the items of each cluster from a
+    random sample of its pairs
+
+    The pairs are drawn uniformly and independently, so the sample mean is
+    an unbiased estimate whose standard error shrinks with the square root
+    of the number of pairs, however large the cluster.
+
+    Parameters
+    ----------
+    clusters : [[str]]
+        the clusters to measure, of at least two items each
+
+    pairs : int
+        the number of pairs sampled from each cluster
+        (default=2000)
+
+    seed : int
+        the random seed
+        (default=0)
+
+    transpositions : bool
+        whether swapping two characters counts as a single edit
+        (default=False)
+
+    cache : DistanceCache
+        an optional store of distances computed before, see edit_distances
+        (default=None)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        the estimated mean of each cluster and its standard error
+
+    """
+    rng = np.random.default_rng(seed)
+    a, b = [], []
+
+    for cluster in clusters:
+        i = rng.integers(len(cluster), size=pairs)
+        j = rng.integers(len(cluster) - 1, size=pairs)
+        j += j >= i
+        a.extend(cluster[x] for x in i)
+        b.extend(cluster[y] for y in j)
+
+    sample = edit_distances(a, b, transpositions, cache=cache)
+    sample = sample.reshape(-1, pairs)
+
+    return sample.mean(axis=1), sample.std(axis=1, ddof=1) / np.sqrt(pairs)
+
+
+def sampled_means(clusters,
+                  above,
+                  pairs=2000,
+                  confidence=0.99,
+                  seed=0,
+                  cache=None):
+    """
+    Estimate the mean distance of the clusters of more than above items,
+    with a margin of error
+
+    A cluster with no more distinct pairs than would be sampled is cheaper to
+    measure exactly, so it is left for the caller to compute.
+
+    Parameters
+    ----------
+    clusters : [[str]]
+        the clusters to measure
+
+    above : int
+        the size beyond which a cluster is sampled, 0 to sample none
+
+    pairs : int
+        the number of pairs sampled from each large cluster, only clusters
+        with more distinct pairs than this are sampled
+        (default=2000)
+
+    confidence : float
+        how likely the true mean is to be within the margin of the estimate
+        (default=0.99)
+
+    seed : int
+        the random seed
+        (default=0)
+
+    cache : DistanceCache
+        an optional store of distances computed before, see edit_distances
+        (default=None)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        the estimated means, NaN for the clusters that were not sampled, and
+        their margins of error
+
+    """
+    means = np.full(len(clusters), np.nan)
+    margins = np.zeros(len(clusters))
+
+    large = np.flatnonzero([above and len(c) > max(above, 2)
+                            and len(c) * (len(c) - 1) // 2 > pairs
+                            for c in clusters])
+    if not len(large):
+        return means, margins
+
+    estimate, error = estimate_means([clusters[k] for k in large],
+                                     pairs,
+                                     seed,
+                                     cache=cache)
+    means[large] = estimate
+    margins[large] = norm.ppf(1 - (1 - confidence) / 2) * error
+
+    return means, margins
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
@@ -8,7 +8,9 @@ import pandas as pd
 
 # named
 from nltk.corpus import wordnet as wn
-from nltk import pos_tag
+
+# project
+from .cache import TokenCache
 
 
 # -- Functions ----------------------------------------------------------------
@@ -20,7 +22,7 @@ class Hypernyms:
     within a cluster
     """
 
-    def __init__(self, clusterconstructor, config):
+    def __init__(self, clusterconstructor, config, tokens=None):
         """
         Constructor for the Hypernyms object.
         Part of the labeling of clusters.
@@ -34,6 +36,10 @@ class Hypernyms:
             that will be labeled.
         config : dict
             a dictionary of configs
+        tokens : TokenCache
+            an optional store of the tags of the strings seen during the
+            run, shared with the other labellers
+            (default=None)
 
         Returns
         -------
@@ -45,6 +51,11 @@ class Hypernyms:
         self.clusters = clusterconstructor.clusters
         # the input wordlist
         self.stoppers = config['stoppers']
+        self.tokens = tokens if tokens is not None \
+            else TokenCache(config['tokeniser'])
+
+        # tag the strings not seen before all together
+        self.tokens.tagged([s for cluster in self.clusters for s in cluster])
 
         # ---------------------------------------------------------------------
 
@@ -249,7 +260,7 @@ class Hypernyms:
         """
         Extract the most suitable noun from a string
         """
-        tags = pos_tag(string.split())
+        tags = self.tokens.tagged([string])[0]
         nouns = [word[0] for word in tags if 'NN' in word[1]]
 
         try:
@@ -1,12 +1,11 @@
 # -- Imports ------------------------------------------------------------------
 
-# base
-import itertools
-
 # third party
 import numpy as np
 
-from nltk.metrics.distance import edit_distance
+# project
+from .distance import (accept_mean, edit_distances, mean_distances,
+                       sampled_means)
 
 
 # -- Definitions --------------------------------------------------------------
@@ -21,7 +20,7 @@ class EditDistance:
     then a cluster is relabelled with an appropriate label
     """
 
-    def __init__(self, clusterconstructor, config):
+    def __init__(self, clusterconstructor, config, cache=None):
         """
         Constructor for the EditDistance object.
 
@@ -32,6 +31,10 @@ class EditDistance:
             that will be labeled.
         config : dict
             a dictionary of configs
+        cache : DistanceCache
+            an optional store of the edit distances computed during the
+            run, shared with the other labellers
+            (default=None)
 
         Returns
         -------
@@ -40,11 +43,33 @@ class EditDistance:
         """
         self.threshold = config['lev_threshold']
         self.clusters = clusterconstructor.clusters
-
-        # find those clusters for which the label is suitable
-        self.accepted = [
-            c for c in self.clusters if self.lad(c) <= self.threshold]
-        self.rejected = [c for c in self.clusters if c not in self.accepted]
+        self.cache = cache
+
+        # how often each string occurs, when that should count
+        self.counts = clusterconstructor.counts \
+            if config['frequency_weights'] else {}
+
+        # large clusters can be decided from a sample of their pairs, when
+        # the estimate is clearly on one side of the threshold
+        means, margins = sampled_means(self.clusters,
+                                       config['lad_sample_above'],
+                                       pairs=config['lad_sample_pairs'],
+                                       confidence=config['lad_confidence'],
+                                       cache=cache)
+        clear = np.abs(means - self.threshold) > margins
+
+        # find those clusters for which the label is suitable, only
+        # computing the distances that are needed to decide
+        exact = [c for c, e in zip(self.clusters, clear) if not e]
+        accept, self.computed, self.pairs = accept_mean(exact,
+                                                        self.threshold,
+                                                        cache=cache)
+        accept = iter(accept)
+        accept = [m <= self.threshold if e else next(accept)
+                  for m, e in zip(means, clear)]
+
+        self.accepted = [c for c, a in zip(self.clusters, accept) if a]
+        self.rejected = [c for c, a in zip(self.clusters, accept) if not a]
 
         # for those clusters we do apply this to, generate the label to apply
         self.label = {
@@ -69,17 +94,17 @@ class EditDistance:
         num
 
         """
-        p = itertools.product(a, b)
+        dists = edit_distances([i for i in a for j in b],
+                               [j for i in a for j in b],
+                               transpositions=True,
+                               cache=self.cache)
 
-        dists = [[edit_distance(i, j, transpositions=True)
-                  for j in b] for i in a]
-        avgs = [np.mean(dist) for dist in dists]
-
-        return np.mean(avgs)
+        return np.mean(dists)
 
     def common(self, a):
         """
-        Find the most common element of a list
+        Find the most common element of a list, counting each string by
+        how often it occurs
 
         Parameters
         ----------
@@ -90,7 +115,11 @@ class EditDistance:
         -------
         num
         """
-        return max(set(a), key=a.count)
+        counts = {}
+        for item in a:
+            counts[item] = counts.get(item, 0) + self.counts.get(item, 1)
+
+        return max(counts, key=counts.get)
 
     def lad(self, a):
         """
@@ -105,12 +134,7 @@ class EditDistance:
         -------
         num
         """
-        if len(a) == 1:
-            return 0
-        else:
-            dists = [edit_distance(i, j)
-                     for i, j in itertools.combinations(a, 2)]
-            return np.mean(dists)
+        return mean_distances([a], cache=self.cache)[0]
 
 
 # -- Boilerplate -----------------------------------------------------------------
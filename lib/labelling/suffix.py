@@ -0,0 +1,187 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import math
+
+
+# -- Definitions --------------------------------------------------------------
+class SuffixAutomaton:
+    """
+    A suffix automaton over several strings at once.
+
+    Every distinct substring of the strings is read by exactly one state, and
+    the substrings of a state are the suffixes of its longest one down to one
+    character longer than the longest of its suffix link. They all occur at
+    the same places, so they share a count of occurrences. The automaton has
+    fewer than twice as many states as there are characters, so the
+    substrings of a cluster can be scored without listing them.
+    """
+
+    def __init__(self, strings, weights=None):
+        """
+        Constructor for the SuffixAutomaton object.
+
+        Parameters
+        ----------
+        strings : [str]
+            the strings to index
+        weights : [num]
+            how much each occurrence in each string counts for, one each if
+            not given
+
+        Returns
+        -------
+        SuffixAutomaton object
+
+        """
+        if weights is None:
+            weights = [1] * len(strings)
+
+        # the state data, state 0 reads the empty string
+        self.length = [0]
+        self.link = [-1]
+        self.next = [{}]
+        self.count = [0]
+        # the (string, end position) at which each state first occurs
+        self.first = [(-1, -1)]
+
+        for s, (string, weight) in enumerate(zip(strings, weights)):
+            last = 0
+            for end, c in enumerate(string):
+                last = self.extend(last, c, (s, end))
+                self.count[last] += weight
+
+        # a substring also occurs wherever a longer one ending with it does
+        for state in sorted(range(1, len(self.length)),
+                            key=self.length.__getitem__,
+                            reverse=True):
+            self.count[self.link[state]] += self.count[state]
+
+    def state(self, length, link, next, first):
+        """
+        Add a state, returning its index
+        """
+        self.length.append(length)
+        self.link.append(link)
+        self.next.append(next)
+        self.count.append(0)
+        self.first.append(first)
+
+        return len(self.length) - 1
+
+    def clone(self, p, q, c):
+        """
+        Split q so that the state reached from p by c is exactly one
+        character longer than p, returning the new state
+        """
+        clone = self.state(self.length[p] + 1,
+                           self.link[q],
+                           dict(self.next[q]),
+                           self.first[q])
+
+        while p != -1 and self.next[p].get(c) == q:
+            self.next[p][c] = clone
+            p = self.link[p]
+        self.link[q] = clone
+
+        return clone
+
+    def extend(self, last, c, first):
+        """
+        Append the character c to the string read by last, returning the
+        state of the longer string
+
+        Parameters
+        ----------
+        last : int
+            the state of the string read so far
+        c : str
+            the next character
+        first : (int, int)
+            the string and position of c
+
+        Returns
+        -------
+        int
+
+        """
+        # the string was seen before, in an earlier string
+        if c in self.next[last]:
+            q = self.next[last][c]
+            if self.length[q] == self.length[last] + 1:
+                return q
+            return self.clone(last, q, c)
+
+        cur = self.state(self.length[last] + 1, 0, {}, first)
+
+        p = last
+        while p != -1 and c not in self.next[p]:
+            self.next[p][c] = cur
+            p = self.link[p]
+
+        if p != -1:
+            q = self.next[p][c]
+            if self.length[q] == self.length[p] + 1:
+                self.link[cur] = q
+            else:
+                self.link[cur] = self.clone(p, q, c)
+
+        return cur
+
+
+def best_substring(strings, weights=None, nstart=3, nend=20):
+    """
+    Find the highest scoring substring of a list of strings, as
+    CharGram.count_ngrams would score the ngrams of CharGram.characters
+
+    A substring scores count^2 * (1 + log(length)), where count is the
+    number of times it occurs, so of the substrings of a state of the suffix
+    automaton the longest allowed one scores highest. Ties go to the
+    substring CharGram.characters lists first: the one in the earliest
+    string, then the shortest, then the one that starts first.
+
+    Parameters
+    ----------
+    strings : [str]
+        the strings to search
+    weights : [num]
+        how much each occurrence in each string counts for, one each if not
+        given
+    nstart : int
+        shortest substring
+    nend : int
+        length of the longest substring to be considered
+
+    Returns
+    -------
+    (str, num, float) / None
+        the substring, its count and its score, or None if no string has a
+        substring long enough
+
+    """
+    sam = SuffixAutomaton(strings, weights)
+
+    best = None
+    for state in range(1, len(sam.length)):
+        length = min(sam.length[state], nend - 1)
+        if length < nstart or length <= sam.length[sam.link[state]]:
+            continue
+
+        count = sam.count[state]
+        score = count * count * (1 + math.log(length))
+        s, end = sam.first[state]
+        key = (score, -s, -length, -(end - length + 1))
+        if best is None or key > best[0]:
+            best = (key, s, end - length + 1, length, count)
+
+    if best is None:
+        return None
+
+    (score, _, _, _), s, start, length, count = best
+    return strings[s][start:start + length], count, score
+
+
+# -- Boilerplate --------------------------------------------------------------
+if __name__ == '__main__':
+    print("Not to be used as a standalone program")
+    raise
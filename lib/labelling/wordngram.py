@@ -1,13 +1,16 @@
 # -- Imports ------------------------------------------------------------------
 
 # base
+import collections
 import itertools
 import math
 
 # third party
+import numpy as np
 import pandas as pd
 
-from nltk.tokenize import word_tokenize
+# project
+from .cache import TokenCache
 
 
 # -- Definitions --------------------------------------------------------------
@@ -20,7 +23,7 @@ class WordGram:
      
     """
 
-    def __init__(self, clusterconstructor, config):
+    def __init__(self, clusterconstructor, config, tokens=None):
         """
         Constructor for the WordGram object.
         Part of the labeling of clusters.
@@ -34,6 +37,10 @@ class WordGram:
             that will be labeled.
         config : dict
             a dictionary of configs
+        tokens : TokenCache
+            an optional store of the tokens of the strings seen during the
+            run, shared with the other labellers
+            (default=None)
 
         Returns
         -------
@@ -44,13 +51,27 @@ class WordGram:
         # objects
         self.threshold = config['wg_threshold']
         self.clusters = clusterconstructor.clusters
+        self.tokens = tokens if tokens is not None \
+            else TokenCache(config['tokeniser'])
 
+        # the most words a gram may combine, 0 for no limit, and whether to
+        # mine the grams that can score highest rather than list them all
+        self.longest = config['wg_max_length']
+        self.mine = config['wg_engine'] == 'mine'
+        self.batch = config['wg_engine'] == 'batch'
+
+        # how often each string occurs, when that should count
+        self.counts = clusterconstructor.counts \
+            if config['frequency_weights'] else {}
+
+        # the batch engine scores every cluster at once, and only builds the
+        # word grams and score tables of each cluster through score_tables
         self.w_grams,\
             self.w_counts,\
             self.wg_all_scores,\
             self.wg_labels,\
             self.accepted,\
-            self.rejected = self.words()
+            self.rejected = self.batch_words() if self.batch else self.words()
 
         self.label = {
             i: key
@@ -73,15 +94,215 @@ class WordGram:
             ngram list
 
         """
+        longest = min(len(words), self.longest or len(words))
+
         ngram_list = [
             w
             for w in itertools.chain.from_iterable(
                 itertools.combinations(words, i)
-                for i in range(1, len(words) + 1))
+                for i in range(1, longest + 1))
         ]
 
         return ngram_list
 
+    def occurrences(self, gram, words):
+        """
+        Count the ways a word gram can be picked out of a list of words, as
+        word_grams would list it
+
+        Parameters
+        ----------
+        gram : tuple
+            the word gram
+        words : list
+            the words to pick it from
+
+        Returns
+        -------
+        int
+
+        """
+        ways = [1] + [0] * len(gram)
+        for word in words:
+            for j in range(len(gram), 0, -1):
+                if gram[j - 1] == word:
+                    ways[j] += ways[j - 1]
+
+        return ways[-1]
+
+    def listed(self, gram, items):
+        """
+        Where word_grams first lists a word gram when run over each item in
+        turn
+
+        Parameters
+        ----------
+        gram : tuple
+            the word gram
+        items : [list]
+            the words of each item
+
+        Returns
+        -------
+        tuple
+            the item, the length of the gram and the positions of its words,
+            or None if no item has it
+
+        """
+        for i, words in enumerate(items):
+            # taking each word as early as it comes gives the first of the
+            # combinations of positions that spell the gram
+            positions = []
+            for word in gram:
+                start = positions[-1] + 1 if positions else 0
+                if word not in words[start:]:
+                    break
+                positions.append(words.index(word, start))
+            else:
+                return i, len(gram), tuple(positions)
+
+        return None
+
+    def mine_grams(self, items, weights):
+        """
+        Count the word grams of a cluster that could score highest, as the
+        counts of word_grams would be for them
+
+        Grams are grown a word at a time, level by level, from where they
+        end in each item. A gram is only grown further when the grams it
+        can grow into could score at least as well as the best gram found so
+        far, which is seeded with the whole of the item that is certain to
+        score highest. Growing a gram never adds ways of picking it out of an
+        item without repeated words, so the counts of a gram bound those of
+        everything grown from it.
+
+        Parameters
+        ----------
+        items : [list]
+            the words of each item
+        weights : [num]
+            how much each item counts for
+
+        Returns
+        -------
+        dict
+            the count of each gram that was grown, including every gram
+            that ties for the best, which come first in the order word_grams
+            lists them
+
+        """
+        # the longest gram of each item and the most a word repeats in it
+        longest = [min(len(words), self.longest or len(words))
+                   for words in items]
+        repeats = [max(collections.Counter(words).values())
+                   for words in items]
+
+        # any gram of an item occurs at least as often as the item, so the
+        # longest one of the heaviest item gives a score to beat
+        seed = max(range(len(items)),
+                   key=lambda i: weights[i] ** 2 * (1 + math.log(longest[i])))
+        seed = tuple(items[seed][:longest[seed]])
+        counts = {seed: sum(weight * self.occurrences(seed, words)
+                            for words, weight in zip(items, weights))}
+        best = counts[seed] ** 2 * (1 + math.log(len(seed)))
+
+        # each gram with the ways it can be picked out of each item ending at
+        # each position
+        level = {}
+        for i, words in enumerate(items):
+            for p, word in enumerate(words):
+                level.setdefault((word,), {}).setdefault(i, {})[p] = 1
+
+        size = 1
+        while level:
+            grow = {}
+            for gram, found in level.items():
+                counts[gram] = sum(weights[i] * sum(ends.values())
+                                   for i, ends in found.items())
+                best = max(best,
+                           counts[gram] ** 2 * (1 + math.log(size)))
+
+            for gram, found in level.items():
+                # the most ways a longer gram could be picked out of the items
+                # this one is in, and the longest it could get
+                reach = sum(
+                    weights[i] * repeats[i] ** (longest[i] - size)
+                    * sum(ways for p, ways in ends.items()
+                          if p < len(items[i]) - 1)
+                    for i, ends in found.items() if longest[i] > size)
+                top = max(longest[i] for i in found)
+                if not reach or reach ** 2 * (1 + math.log(top)) < best:
+                    continue
+
+                for i, ends in found.items():
+                    if longest[i] <= size:
+                        continue
+                    words = items[i]
+                    for p, ways in ends.items():
+                        for q in range(p + 1, len(words)):
+                            grown = grow.setdefault(gram + (words[q],), {})
+                            grown = grown.setdefault(i, {})
+                            grown[q] = grown.get(q, 0) + ways
+
+            level = grow
+            size += 1
+
+        # the grams are found out of the order word_grams lists them in, put
+        # those that tie for the best first in that order, so that ties are
+        # broken as they would be without mining
+        scores = {gram: count * count * (1 + math.log(len(gram)))
+                  for gram, count in counts.items()}
+        top = max(scores.values())
+        tied = sorted((gram for gram, score in scores.items() if score == top),
+                      key=lambda gram: self.listed(gram, items))
+
+        return {gram: counts[gram] for gram in itertools.chain(tied, counts)}
+
+    def tokenise(self, cluster):
+        """
+        Tokenise the items of a cluster, keeping those with a word of at
+        least three characters
+
+        Parameters
+        ----------
+        cluster : [str]
+            the items of the cluster
+
+        Returns
+        -------
+        ([list], [num], bool)
+            the words of each item kept, how much it counts for and whether
+            the cluster qualifies for a label, which is decided by its last
+            item
+
+        """
+        tokens = []
+        weights = []
+
+        # we test to make sure that there is at least one word with length long
+        # three characters - this flag is used to only append if that tis the c
+        flag_include = True
+
+        for item in cluster:
+            # tokenise the string in a cluster
+            words = self.tokens.tokens(item)
+
+            # skip empty lists
+            if not words:
+                flag_include = False
+            else:
+                # test for length of word greater than three
+                max_word_length = max([len(i) for i in words])
+
+                if max_word_length < 3:
+                    flag_include = False
+                else:
+                    flag_include = True
+                    tokens.append(words)
+                    weights.append(self.counts.get(item, 1))
+
+        return tokens, weights, flag_include
+
     def words(self):
         # lists to collect cluster word-gram combinations
         all_ngram = []
@@ -91,51 +312,36 @@ class WordGram:
         accepted = []
         rejected = []
 
-        # we test to make sure that there is at least one word with length long
-        # three characters - this flag is used to only append if that tis the c
-        flag_include = True
-
         all_scores = []
         links = {}
         for cluster in self.clusters:
-            # list to collec tthe cluster word grams
-            ngram = []
             # dictionary to count the occurance of tuples within the cluster
             counts = {}
 
-            for item in cluster:
-                # tokenise the string in a cluster
-                words = word_tokenize(item)
+            # the words of each item and the weight of the item each set of
+            # word grams came from
+            tokens, weights, flag_include = self.tokenise(cluster)
 
-                # skip empty lists
-                if not words:
-                    flag_include = False
-                else:
-                    # test for length of word greater than three
-                    max_word_length = max([len(i) for i in words])
-
-                    if max_word_length < 3:
-                        flag_include = False
-                    else:
-                        flag_include = True
-                        # get word grams for the tokenised word list
-                        wg = self.word_grams(words)
-                        # convert word grams to tuples
-                        wg = [tuple(item) for item in wg]
-                        # append word gram tuples to cluster list
-                        ngram.append(wg)
+            # list to collec tthe cluster word grams, unless mining them
+            ngram = [] if self.mine else [
+                [tuple(item) for item in self.word_grams(words)]
+                for words in tokens
+            ]
 
             # once all items in a cluster have had word grams established
             # for each set of word grams
 
             if flag_include:
-                for item in ngram:
+                if self.mine:
+                    counts = self.mine_grams(tokens, weights)
+
+                for item, weight in zip(ngram, weights):
                     # for each individual wordgram add it to the dictionary
                     for i in item:
                         if i in counts:
-                            counts[i] += 1
+                            counts[i] += weight
                         else:
-                            counts[i] = 1
+                            counts[i] = weight
 
                 all_ngram.append(ngram)
                 wg_counts.append(counts)
@@ -149,15 +355,19 @@ class WordGram:
                     lambda row: row.no * row.no * (1 + math.log(row.length)),
                     axis=1)
 
+                # a stable sort leaves tied word grams in the order they were
+                # first seen
                 df_wordgrams = df_wordgrams.sort_values(
                     "score",
-                    ascending=False)
+                    ascending=False,
+                    kind='stable')
 
                 all_scores.append(df_wordgrams)
 
                 new_label = " ".join([str(x) for x in df_wordgrams.iloc[0][0]])
 
-                if df_wordgrams.iloc[0, 3] / len(cluster) > self.threshold:
+                size = sum(self.counts.get(item, 1) for item in cluster)
+                if df_wordgrams.iloc[0, 3] / size > self.threshold:
                     accepted.append(cluster)
                     links[new_label] = cluster
                 else:
@@ -167,6 +377,105 @@ class WordGram:
 
         return all_ngram, wg_counts, all_scores, links, accepted, rejected
 
+    def batch_words(self):
+        """
+        Scores the word grams of every cluster together, with the same output
+        as words but for the word grams and score tables of each cluster
+
+        The word grams of all the clusters are counted into the non zero
+        entries of a single sparse cluster x word gram matrix, which is
+        scored, reduced to the best word gram of each cluster and checked
+        against the threshold with a handful of array operations. Ties go to
+        the word gram seen first in the cluster, as they do in words, so the
+        labels are the same whichever engine is used.
+
+        """
+        links = {}
+        accepted = []
+        rejected = []
+
+        # the word grams of every item, each counting as often as the item
+        # occurs, as (cluster, word gram, weight) entries
+        vocab = {}
+        rows = []
+        cols = []
+        data = []
+        for k, cluster in enumerate(self.clusters):
+            tokens, weights, flag_include = self.tokenise(cluster)
+            if not flag_include:
+                continue
+            for words, weight in zip(tokens, weights):
+                grams = self.word_grams(words)
+                cols.extend(vocab.setdefault(g, len(vocab)) for g in grams)
+                rows.extend([k] * len(grams))
+                data.extend([weight] * len(grams))
+
+        # sum the duplicate entries, remembering where each was first seen
+        width = max(len(vocab), 1)
+        keys = np.asarray(rows, dtype=np.int64) * width \
+            + np.asarray(cols, dtype=np.int64)
+        keys, first, inverse = np.unique(keys,
+                                         return_index=True,
+                                         return_inverse=True)
+        no = np.bincount(inverse, weights=data, minlength=len(keys))
+        row, col = np.divmod(keys, width)
+
+        # score = count^2 * (1 + log(length)), the best of each cluster, with
+        # the log of math as words has it, numpy's may differ in the last bit
+        lengths = np.array([1 + math.log(len(g)) for g in vocab])
+        scores = no * no * lengths[col]
+        order = np.lexsort((first, -scores, row))
+        top = order[np.searchsorted(row[order], np.unique(row))]
+
+        sizes = np.array([sum(self.counts.get(item, 1) for item in cluster)
+                          for cluster in self.clusters], dtype=np.float64)
+        passed = scores[top] / sizes[row[top]] > self.threshold
+
+        # kept to build the score tables on request
+        self.grams = list(vocab)
+        self.entries = row, col, no, scores, first
+
+        best = dict(zip(row[top].tolist(), zip(col[top].tolist(), passed)))
+        for k, cluster in enumerate(self.clusters):
+            if k in best and best[k][1]:
+                accepted.append(cluster)
+                links[" ".join(self.grams[best[k][0]])] = cluster
+            else:
+                rejected.append(cluster)
+
+        return [], [], [], links, accepted, rejected
+
+    def score_tables(self):
+        """
+        The table of scores of each cluster that qualified for a label, as
+        words keeps in wg_all_scores, built from the batch entries when the
+        batch engine was used
+
+        Returns
+        -------
+        [pandas.core.frame.DataFrame]
+            wordgram | no | length | score tables, best first
+
+        """
+        if not self.batch:
+            return self.wg_all_scores
+
+        row, col, no, scores, first = self.entries
+        tables = []
+        for k in np.unique(row):
+            # in the order the word grams were first seen, as words has them
+            selected = np.flatnonzero(row == k)
+            selected = selected[np.argsort(first[selected])]
+            table = pd.DataFrame({
+                'wordgram': [self.grams[c] for c in col[selected]],
+                'no': no[selected],
+                'length': [len(self.grams[c]) for c in col[selected]],
+                'score': scores[selected]})
+            tables.append(
+                table.sort_values("score", ascending=False, kind='stable'))
+
+        return tables
+
 
 # -- Boilerplate --------------------------------------------------------------
 if __name__ == '__main__':
@@ -6,7 +6,7 @@ import numpy as np
 
 # project
 from lib.data import SimpleLoader
-from lib.clustering import Clusterer, ClusterConstructor
+from lib.clustering import Clusterer, ClusterConstructor, collapse
 
 # -- Definitions --------------------------------------------------------------
 
@@ -25,7 +25,8 @@ class Gatekeeper:
                  hypernyms,
                  matrix,
                  config,
-                 prowl):
+                 prowl,
+                 cache=None):
         """
         Constructor for the Gatekeeper object.
 
@@ -61,6 +62,10 @@ class Gatekeeper:
             a pandas dataframe which contains the labels from previous
             iterations alongside the original labels
 
+        cache : EmbeddingCache
+            an optional on disk cache of previously embedded strings
+            (default=None)
+
         Returns
         -------
         Gatekeeper object
@@ -111,13 +116,50 @@ class Gatekeeper:
         else:
             pass
 
-        words = list(set(self.prowl['current_labels'].tolist()))
+        words = list(dict.fromkeys(self.prowl['current_labels'].tolist()))
+
+        # the labels accepted in this tier, keyed by the word they replace
+        mapping = dict(zip(self.accepted['from'], self.accepted['to']))
 
         if clusterconstructor.distance == config['cutoff']:
             self.clusterconstructor = self.Iter_switch()
+        elif config['tier_engine'] == 'cut':
+            # the next tier was already cut from the first linkage
+            self.clusterconstructor = clusterconstructor.advance(mapping)
         else:
-            simpleloader = SimpleLoader(words, linked)
-            clusterer = Clusterer(simpleloader, matrix, config)
+            if config['tier_engine'] == 'incremental':
+                # collapse the accepted clusters into the existing linkage
+                # rather than embedding and linking the labels again
+                words, vectors, weights, Z = collapse(
+                    clusterconstructor.words,
+                    clusterconstructor.vectors,
+                    clusterconstructor.weights,
+                    clusterconstructor.Z.values,
+                    mapping)
+                simpleloader = SimpleLoader(words, linked, vectors=vectors,
+                                            weights=weights, Z=Z)
+            elif config['frequency_weights']:
+                # each label carries the weight of the words it replaced
+                counts = {}
+                for word, weight in zip(clusterconstructor.words,
+                                        clusterconstructor.weights):
+                    label = mapping.get(word, word)
+                    counts[label] = counts.get(label, 0) + weight
+                # labels that were never clustered, such as descriptions
+                # that cleaned to '', count the rows that hold them
+                rows = self.prowl['current_labels'].value_counts()
+                simpleloader = SimpleLoader(
+                    words,
+                    linked,
+                    weights=[counts.get(word, rows[word]) for word in words])
+            else:
+                simpleloader = SimpleLoader(words, linked)
+            # later tiers are projected the same way as the first one
+            clusterer = Clusterer(simpleloader,
+                                  matrix,
+                                  config,
+                                  cache=cache,
+                                  projection=clusterconstructor.projection)
             self.clusterconstructor = (ClusterConstructor(
                 clusterer,
                 config,
@@ -8,7 +8,8 @@ from sklearn.neighbors import KNeighborsClassifier
 import numpy as np
 import pandas as pd
 
-# named
+# project
+from lib.embedding import embed, embed_tokens, quantise, blocks
 
 
 # -- Functions ----------------------------------------------------------------
@@ -57,21 +58,21 @@ class KNN:
 
         self.train_data= df[ids.isin(ids[ids.duplicated()])]
 
-        self.train_knn = np.array(
-            self.embed(self.train_data["current_labels"], self.matrix)
-        )
+        # the labels act as the index into the training matrix
+        self.train_labels = self.train_data["current_labels"].values
+        self.train_knn = self.embed(self.train_labels, self.matrix)
 
         print(f"self.train_knn")
         print(self.train_knn)
 
         # TODO: check if the Gatekeeper.non_selected is really what we need to
-        self.non_selected = np.array(
-            self.embed(gatekeeper.non_selected, self.matrix))
+        self.non_selected_words = list(gatekeeper.non_selected)
+        self.non_selected = self.embed(self.non_selected_words, self.matrix)
         # extract the current_labels from the prowl object in hottrod
         # TODO: make sure the code here takes the right labels to be
         # trained upon.
-        self.current_labels = np.array(self.embed(
-            gatekeeper.prowl['current_labels'].values.tolist(), self.matrix))
+        self.current_labels = self.embed(
+            gatekeeper.prowl['current_labels'].values.tolist(), self.matrix)
         # pretty obvious, but - fit the sklearn KNN
         self.fitKNN()
 
@@ -92,14 +93,44 @@ class KNN:
 
         Returns
         -------
-        list
-            a list of tuples with words and vectors
+        numpy.ndarray / QuantisedVectors
+            a matrix stored at config['vector_precision'], row i holds the
+            vector of words[i]
 
         """
         # use the fast text model to perform embeddings
-        vectors = [model.get_word_vector(word) for word in words]
+        config = self.gatekeeper.config
+        kwargs = {'workers': config['embed_workers'],
+                  'batch': config['embed_batch'],
+                  'pool': config['embed_pool']}
 
-        return [(w, *v) for w, v in zip(words, vectors)]
+        # embed the same way as the clusterer did
+        if config['embed_mode'] == 'tokens':
+            vectors = embed_tokens(
+                words, model, idf=config['token_idf'], **kwargs)
+        else:
+            vectors = embed(words, model, **kwargs)
+
+        return quantise(vectors, config['vector_precision'])
+
+    def predict(self, vectors):
+        """
+        Predict the labels of a matrix one block of rows at a time, so that
+        reduced precision vectors are never fully expanded
+
+        Parameters
+        ----------
+        vectors : numpy.ndarray / QuantisedVectors
+            the vectors to predict labels for
+
+        Returns
+        -------
+        numpy.array
+            the predicted labels
+
+        """
+        return np.concatenate(
+            [self.KNN.predict(block) for _, block in blocks(vectors)])
 
     def fitKNN(self):
         """
@@ -116,8 +147,8 @@ class KNN:
         """
         # create an fit a classifier based on the current_labels data
         classifier = KNeighborsClassifier(n_neighbors=2)
-        train_X = self.train_knn[:, 1:]
-        train_y = self.train_knn[:, 0]
+        train_X = np.asarray(self.train_knn)
+        train_y = self.train_labels
 
         print(train_y)
 
@@ -149,21 +180,20 @@ class KNN:
         # get predictions for them
         if X:
             print("or this one")
-            predictions = self.KNN.predict(
-                np.array(self.embed(X, self.matrix))[:, 1:])
+            predictions = self.predict(self.embed(X, self.matrix))
             return np.array(list(zip(X, predictions)))
         else:  # if no X is passed run the non_selected labels from gatekeeper
             print("correct prediction triggered")
             pred =  np.array(
                 list(
                     zip(
-                        self.non_selected,
-                        self.KNN.predict(self.current_labels[:, 1:])
+                        self.non_selected_words,
+                        self.predict(self.current_labels)
                     )
                 ))
             print("current_labels")
-            print(self.current_labels[:, 1:])
-            print(self.current_labels[:, 1:].shape)
+            print(self.current_labels)
+            print(self.current_labels.shape)
             print(f"pred")
             print(pred)
             return(pred)
@@ -180,10 +210,10 @@ class KNN:
         """
         while True:
             print('\nNOTE: Interrupt kernel to stop the slideshow')
-            selection = self.non_selected[np.random.randint(
-                0, len(self.non_selected)), :]
-            print(f'Original Label: {selection[0]}\n',
-                  f'Prediction: {self.KNN.predict(selection[1:].reshape(1,-1))[0]}')
+            i = np.random.randint(0, len(self.non_selected_words))
+            selection = self.non_selected[i].reshape(1, -1)
+            print(f'Original Label: {self.non_selected_words[i]}\n',
+                  f'Prediction: {self.KNN.predict(selection)[0]}')
             time.sleep(3)
 
 
@@ -11,7 +11,9 @@ import pandas as pd
 # project
 from lib.data import Loader
 from lib.clustering import Clusterer, ClusterConstructor
-from lib.labelling import EditDistance, WordGram, CharGram, Hypernyms
+from lib.embedding import EmbeddingCache, MemoryCache, registry
+from lib.labelling import (EditDistance, WordGram, CharGram, Hypernyms,
+                           DistanceCache, TokenCache)
 from lib.utils import Gatekeeper, KNN
 
 
@@ -311,16 +313,40 @@ class Optimus:
             self.vprint("-- Model already loaded")
 
         else:
-            self.vprint("-- Loading model")
-            self.matrix = ft.load_model(self.config['model'])
+            if registry.loaded(self.config['model']):
+                self.vprint("-- Model already loaded in the registry")
+            else:
+                self.vprint("-- Loading model")
+            self.matrix = registry.load(
+                self.config['model'],
+                budget=self.config['model_memory_budget'] * 2**30)
+            self.model_path = self.config['model']
+
+        cache = self.load_cache()
+
+        # in token mode the token vectors are worth keeping for the whole run
+        # even without an on disk cache, as later tiers reuse the tokens
+        if cache is None and self.config['embed_mode'] == 'tokens':
+            cache = MemoryCache()
 
         self.vprint("-- Embedding")
-        clusterer = Clusterer(L, self.matrix, self.config)
+        clusterer = Clusterer(L,
+                              self.matrix,
+                              self.config,
+                              cache=cache,
+                              model_path=getattr(self, 'model_path', None))
 
         # clustering
         self.vprint("-- Clustering")
         CC = ClusterConstructor(clusterer, self.config)
 
+        # the edit distances measured by the labellers, kept for the run
+        distances = DistanceCache(self.config['distance_cache_size']) \
+            if self.config['distance_cache_size'] else None
+
+        # and the tokens and tags of each string, worked out once per run
+        tokens = TokenCache(self.config['tokeniser'])
+
         # start the loop for each depth
         self.vprint('_' * 79)  # some decoration
         while CC.iterate:
@@ -329,7 +355,7 @@ class Optimus:
             self.vprint('_' * 79)  # some decoration
 
             # edit distance based metrics
-            ED = EditDistance(CC, self.config)
+            ED = EditDistance(CC, self.config, cache=distances)
             # push the rejected clusters back to the ClusterConstructor
             # for the next phase
             CC.clusters = ED.rejected
@@ -337,21 +363,21 @@ class Optimus:
                 f"    ** | Edit Distance   | classified: {len(ED.accepted)}")
 
             # class for character and word n-gram and scoring
-            WG = WordGram(CC, self.config)
+            WG = WordGram(CC, self.config, tokens=tokens)
             # push the rejected clusters back to CC for the next phase
             CC.clusters = WG.rejected
             self.vprint(
                 f"    ** | Word Grams      | classified: {len(WG.accepted)}")
 
             # class for character and word n-gram and scoring
-            CG = CharGram(CC, self.config)
+            CG = CharGram(CC, self.config, cache=distances)
             # push the rejected clusters back to CC for the next phase
             CC.clusters = CG.rejected
             self.vprint(
                 f"    ** | Character Grams | classified: {len(CG.accepted)}")
 
             # class for finding suitable hypernyms from WordNet
-            HN = Hypernyms(CC, self.config)
+            HN = Hypernyms(CC, self.config, tokens=tokens)
             # push the rejected clusters back to CC for the next phase
             CC.clusters = HN.rejected
             self.vprint(
@@ -359,13 +385,29 @@ class Optimus:
 
             # gatekeeper, overwrites the CC with what it needs for the
             # next push
-            H = Gatekeeper(CC, ED, WG, CG, HN, self.matrix, self.config, prowl)
+            H = Gatekeeper(CC, ED, WG, CG, HN, self.matrix, self.config, prowl,
+                           cache=cache)
 
             CC = H.clusterconstructor
             prowl = H.prowl
 
             self.vprint('_' * 79)
 
+        if cache is not None:
+            self.vprint(
+                f"-- Embedding cache | hits: {cache.hits} "
+                f"| misses: {cache.misses}")
+
+        if distances is not None:
+            self.vprint(
+                f"-- Distance cache  | hits: {distances.hits} "
+                f"| misses: {distances.misses} "
+                f"| hit rate: {distances.rate:.1%}")
+
+        self.vprint(
+            f"-- Token cache     | hits: {tokens.hits} "
+            f"| misses: {tokens.misses}")
+
         # if requested run a KNN on the non_labeled data
         #if runKNN:
         #    self.vprint(f"-- Performing KNN")
@@ -380,13 +422,46 @@ class Optimus:
         # return output
         return self.handle_output(prowl, save_csv=save_csv, full=full)
 
+    def load_cache(self):
+        """
+        Open the on disk embedding cache if one is set in the
+        config['embedding_cache'] entry.
+
+        The cache is namespaced by the fingerprint of the model file, so it
+        can only be used when the model was loaded from a known path.
+
+        Returns
+        -------
+        EmbeddingCache / None
+            the cache for the current model or None if caching is off
+
+        """
+        if not self.config['embedding_cache']:
+            return None
+
+        if not getattr(self, 'model_path', None):
+            self.vprint(
+                "-- WARNING: The model was not loaded from a path, "
+                "embedding cache disabled")
+            return None
+
+        self.vprint("-- Opening embedding cache")
+        return EmbeddingCache(self.config['embedding_cache'],
+                              self.model_path,
+                              size=self.config['embedding_cache_size'])
+
     def clean_up(self):
         """
         A quick function to call the garbage collector to remove the loaded
         model from memory.
 
+        While a registry session is open the model is left resident in the
+        registry so that the next call does not have to load it again.
+
         """
         del(self.matrix)
+        if not registry.active and getattr(self, 'model_path', None):
+            registry.release(self.model_path)
         gc.collect()
 
     def replace_model(self, model=None):
@@ -401,11 +476,15 @@ class Optimus:
         If a model was loaded prior and no model is passed to replace it, it
         will be deleted and garbage collected.
 
+        Models given as a path are loaded through the model registry, so a
+        model that is already resident is shared rather than loaded again.
+
         Parameters
         ----------
-        model : str / fastText model object
+        model : str / fastText model object / backend object
             this will be the model that is (loaded and) passed onto the Optimus
-            object
+            object. Paths are loaded with the backend matching their extension
+            (.bin, .vec or .npy), see lib.embedding.load_model
 
         Returns
         -------
@@ -414,6 +493,7 @@ class Optimus:
         """
         # catch any incorrectly passed models
         model_type = type(model)
+        model_path = None
 
         if model_type not in [ft.FastText._FastText, model_type]:
             raise ValueError(
@@ -422,7 +502,8 @@ class Optimus:
         elif model_type == str:
             print(f'-- Loading model from given path {model}')
             try:
-                model = ft.load_model(model)
+                model_path = model
+                model = registry.load(model)
 
             except ValueError:
                 raise ValueError('The given path could not be loaded.')
@@ -437,6 +518,7 @@ class Optimus:
 
             print('-- Assigning the given model the Optimus object')
             self.matrix = model
+            self.model_path = model_path
 
         else:
             print('-- No model provided. Cleaning up the loaded model')
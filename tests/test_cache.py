@@ -0,0 +1,66 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+import pytest
+
+# project
+from lib.embedding.cache import EmbeddingCache
+
+
+# -- Tests --------------------------------------------------------------------
+def filled(path, model, words, vectors, size):
+    """
+    A cache of size holding vectors, one run per word
+    """
+    for word, vector in zip(words, vectors):
+        cache = EmbeddingCache(path, model, size=size)
+        cache.update([word], vector[None])
+
+    return EmbeddingCache(path, model, size=size)
+
+
+def lookup(cache, words):
+    """
+    The cached vectors of words and the positions of those not found
+    """
+    out = np.zeros((len(words), cache.dim), dtype=np.float32)
+    return out, cache.get(words, out)
+
+
+def test_eviction_keeps_the_newest_vectors(tmp_path):
+    model = tmp_path / 'model.bin'
+    model.write_bytes(b'model')
+    words = [f'word{i}' for i in range(6)]
+    vectors = np.random.default_rng(0).random((6, 3), dtype=np.float32)
+
+    cache = filled(str(tmp_path), str(model), words, vectors, size=4)
+    out, missing = lookup(cache, words)
+
+    assert missing == [0, 1]
+    assert np.array_equal(out[2:], vectors[2:])
+
+
+def test_eviction_stopped_before_the_index_is_saved(tmp_path, monkeypatch):
+    model = tmp_path / 'model.bin'
+    model.write_bytes(b'model')
+    words = [f'word{i}' for i in range(6)]
+    vectors = np.random.default_rng(1).random((6, 3), dtype=np.float32)
+
+    cache = filled(str(tmp_path), str(model), words[:4], vectors[:4], size=4)
+
+    # stop the run once the compacted vectors are written
+    def stop():
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cache, 'save', stop)
+    with pytest.raises(KeyboardInterrupt):
+        cache.update(words[4:], vectors[4:])
+    monkeypatch.undo()
+
+    # the index on disk still names the vectors it was saved with
+    cache = EmbeddingCache(str(tmp_path), str(model), size=4)
+    out, missing = lookup(cache, words)
+
+    assert missing == [4, 5]
+    assert np.array_equal(out[:4], vectors[:4])
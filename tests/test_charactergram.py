@@ -0,0 +1,41 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import json
+import os
+import random
+from types import SimpleNamespace
+
+# project
+from lib.labelling.charactergram import CharGram
+
+
+# -- Tests --------------------------------------------------------------------
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_engines_break_ties_alike():
+    with open(os.path.join(ROOT, 'etc', 'config.json')) as f:
+        config = json.load(f)
+    rng = random.Random(0)
+
+    for trial in range(50):
+        # few letters make for many equally scoring n-grams
+        clusters = [[''.join(rng.choice('ab c')
+                             for _ in range(rng.randint(3, 12)))
+                     for _ in range(rng.randint(2, 6))]
+                    for _ in range(5)]
+        constructor = SimpleNamespace(
+            clusters=clusters,
+            counts={item: rng.randint(1, 3)
+                    for cluster in clusters for item in cluster})
+
+        labels = [
+            CharGram(constructor,
+                     dict(config,
+                          ng_engine=engine,
+                          ng_threshold=0,
+                          frequency_weights=bool(trial % 2))).ng_lookup
+            for engine in ('table', 'batch', 'suffix')]
+
+        assert labels[0] == labels[1] == labels[2]
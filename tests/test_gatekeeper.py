@@ -0,0 +1,62 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import json
+import os
+
+# third party
+import numpy as np
+import pandas as pd
+
+# project
+from lib.clustering import Clusterer, ClusterConstructor
+from lib.data import Loader
+from lib.embedding import ArrayModel
+from lib.utils import Gatekeeper
+
+
+# -- Tests --------------------------------------------------------------------
+class Unlabelled:
+    """
+    A labeller that accepts none of the clusters
+    """
+    label = {}
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_frequency_weights_with_an_empty_description(tmp_path, monkeypatch):
+    # the loader writes its output to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    words = ['red apple', 'green apple', 'apple', 'pear', 'green pear']
+
+    rng = np.random.RandomState(0)
+    np.save(tmp_path / 'model.npy',
+            rng.normal(size=(len(words), 4)).astype(np.float32))
+    (tmp_path / 'model.vocab').write_text('\n'.join(words) + '\n')
+    model = ArrayModel(str(tmp_path / 'model.npy'))
+
+    with open(os.path.join(ROOT, 'etc', 'config.json')) as f:
+        config = json.load(f)
+    config.update(frequency_weights=True, regex=[['[0-9]', '']],
+                  distance=1, cutoff=3, stepsize=0.5)
+
+    # '123' cleans to '', which the loader leaves out but the prowl keeps
+    data = [[w] for w in words + ['apple', '123']]
+    loader = Loader(config, data)
+    prowl = pd.DataFrame.from_dict(loader.linked, orient='index')
+    prowl = prowl.reset_index()
+    prowl.columns = ['original', 'current_labels']
+
+    clusterer = Clusterer(loader, model, config)
+    clusterconstructor = ClusterConstructor(clusterer, config)
+    gatekeeper = Gatekeeper(clusterconstructor,
+                            Unlabelled(), Unlabelled(), Unlabelled(),
+                            Unlabelled(), model, config, prowl)
+
+    weights = dict(zip(gatekeeper.clusterconstructor.words,
+                       gatekeeper.clusterconstructor.weights))
+    assert weights['apple'] == 2
+    assert weights[''] == 1
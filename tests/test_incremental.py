@@ -0,0 +1,50 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+import scipy.cluster.hierarchy as H
+
+# project
+from lib.clustering import collapse
+from lib.clustering.ward import ward_linkage
+
+
+# -- Tests --------------------------------------------------------------------
+def relinked(words, vectors, weights, mapping):
+    """
+    Collapse the words and link them again from scratch, for comparison
+    """
+    Z = H.linkage(vectors, 'ward') if np.all(weights == 1) \
+        else ward_linkage(vectors, weights=weights)
+    collapsed, centroids, mass, linked = collapse(words, vectors, weights, Z,
+                                                  mapping)
+
+    return linked, ward_linkage(centroids.astype(np.float64), weights=mass)
+
+
+def test_dropped_merge_frees_its_other_side():
+    # D and E share a label, dropping D's merge with C lets C join A before
+    # A joins B
+    vectors = np.array([[0], [0.8], [-0.6], [-1.1], [100], [101.5]])
+    linked, expected = relinked(list('ABCDEF'),
+                                vectors,
+                                np.ones(6),
+                                {'D': 'lab', 'E': 'lab'})
+
+    np.testing.assert_allclose(linked, expected, atol=1e-5)
+
+
+def test_matches_a_fresh_linkage():
+    rng = np.random.RandomState(0)
+
+    for trial in range(20):
+        n = 60
+        words = [str(i) for i in range(n)]
+        vectors = rng.normal(size=(n, 3))
+        weights = rng.randint(1, 4, size=n).astype(np.float64)
+        mapping = {w: f'label {rng.randint(8)}'
+                   for w in rng.choice(words, 20, replace=False)}
+
+        linked, expected = relinked(words, vectors, weights, mapping)
+
+        np.testing.assert_allclose(linked, expected, atol=1e-5)
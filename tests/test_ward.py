@@ -0,0 +1,82 @@
+# -- Imports ------------------------------------------------------------------
+
+# third party
+import numpy as np
+import scipy.cluster.hierarchy as H
+
+# project
+from lib.clustering.ward import ward_linkage
+from lib.embedding import QuantisedVectors
+
+
+# -- Tests --------------------------------------------------------------------
+def same_partition(a, b):
+    """
+    Whether two flat clusterings group the observations the same way
+    """
+    return len(set(zip(a, b))) == len(set(a)) == len(set(b))
+
+
+def cuts(Z):
+    """
+    Thresholds half way between the distinct heights of a linkage
+    """
+    heights = np.unique(np.round(Z[:, 2], 9))
+    return (heights[1:] + heights[:-1]) / 2
+
+
+def test_matches_scipy_with_tied_inputs():
+    rng = np.random.RandomState(0)
+
+    for trial in range(20):
+        n, dim = rng.randint(20, 200), rng.randint(1, 6)
+        # repeated observations, and a grid nudged just off its ties
+        if trial % 2:
+            X = rng.randn(n // 3 + 1, dim)[rng.randint(0, n // 3 + 1, n)]
+        else:
+            X = np.round(rng.randn(n, dim) * 3) + rng.randn(n, dim) * 1e-6
+
+        expected = H.linkage(X, 'ward')
+        Z = ward_linkage(X)
+
+        np.testing.assert_allclose(np.sort(Z[:, 2]),
+                                   np.sort(expected[:, 2]),
+                                   atol=1e-9)
+        for t in cuts(expected):
+            assert same_partition(H.fcluster(Z, t, 'distance'),
+                                  H.fcluster(expected, t, 'distance'))
+
+
+def test_heights_are_ward_distances_on_a_grid():
+    rng = np.random.RandomState(1)
+    X = np.round(rng.randn(150, 2) * 2)
+    weights = rng.randint(1, 4, len(X))
+
+    Z = ward_linkage(X, weights=weights)
+
+    # whichever way the ties went, every merge is at the distance of the
+    # clusters it joins
+    members = [[i] for i in range(len(X))]
+    for a, b, height, count in Z:
+        a, b = members[int(a)], members[int(b)]
+        wa, wb = weights[a].sum(), weights[b].sum()
+        ca, cb = weights[a] @ X[a] / wa, weights[b] @ X[b] / wb
+        assert np.isclose(height,
+                          np.sqrt(2 * wa * wb / (wa + wb)) *
+                          np.linalg.norm(ca - cb))
+        assert count == len(a) + len(b)
+        members.append(a + b)
+
+
+def test_reads_stores_without_copying_them(tmp_path):
+    rng = np.random.RandomState(2)
+    X = rng.randn(300, 8).astype(np.float32)
+    quantised = QuantisedVectors(X, 'int8')
+
+    np.save(tmp_path / 'vectors.npy', X)
+    mapped = np.load(tmp_path / 'vectors.npy', mmap_mode='r')
+
+    np.testing.assert_array_equal(ward_linkage(mapped, block=64),
+                                  ward_linkage(X))
+    np.testing.assert_array_equal(ward_linkage(quantised, block=64),
+                                  ward_linkage(np.asarray(quantised)))
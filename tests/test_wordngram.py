@@ -0,0 +1,67 @@
+# -- Imports ------------------------------------------------------------------
+
+# base
+import json
+import os
+import random
+from types import SimpleNamespace
+
+# project
+from lib.labelling.wordngram import WordGram
+
+
+# -- Tests --------------------------------------------------------------------
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENGINES = ('table', 'mine', 'batch')
+
+
+def test_engines_break_ties_alike():
+    with open(os.path.join(ROOT, 'etc', 'config.json')) as f:
+        config = json.load(f)
+    rng = random.Random(0)
+    words = ['copper', 'cable', 'steel', 'wire', 'pipe', 'rope', 'brass']
+
+    for trial in range(100):
+        # few words make for many equally scoring word grams
+        clusters = [[' '.join(rng.choice(words)
+                              for _ in range(rng.randint(1, 5)))
+                     for _ in range(rng.randint(2, 6))]
+                    for _ in range(4)]
+        constructor = SimpleNamespace(
+            clusters=clusters,
+            counts={item: rng.randint(1, 3)
+                    for cluster in clusters for item in cluster})
+
+        labels = [
+            WordGram(constructor,
+                     dict(config,
+                          wg_engine=engine,
+                          wg_threshold=0,
+                          wg_max_length=trial % 3,
+                          tokeniser='regex',
+                          frequency_weights=bool(trial % 2))).label
+            for engine in ENGINES]
+
+        assert all(label == labels[0] for label in labels)
+
+
+def test_batch_score_tables_match_the_table_engine():
+    with open(os.path.join(ROOT, 'etc', 'config.json')) as f:
+        config = json.load(f)
+    constructor = SimpleNamespace(
+        clusters=[['copper cable', 'cable copper', 'steel wire'],
+                  ['wire rope', 'steel rope', 'rope wire steel']],
+        counts={})
+
+    tables = [
+        WordGram(constructor,
+                 dict(config,
+                      wg_engine=engine,
+                      wg_threshold=0,
+                      tokeniser='regex')).score_tables()
+        for engine in ('table', 'batch')]
+
+    for table, batch in zip(*tables):
+        assert list(table['wordgram']) == list(batch['wordgram'])
+        assert list(table['score']) == list(batch['score'])